@@ -0,0 +1,162 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements batched writes of container cgroup files """
+
+from __future__ import print_function
+
+import os
+import sys
+import traceback
+
+from collections import OrderedDict
+from datetime import datetime
+from os.path import join as path_join
+from threading import Lock, Thread
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class CgroupActuator(object):
+    """
+    This class applies batches of cgroup file writes in a worker thread.
+    Open file descriptors and last applied values are cached per container,
+    and writes identical to the last applied value are skipped. CFS periods
+    are looked up by callers and released by the worker, they are guarded by
+    a lock
+    """
+    PREFIX = '/sys/fs/cgroup/cpu/'
+    DESCRIPTIONS = {
+        'cpu.cfs_quota_us': 'cpu quota',
+        'cpu.shares': 'cpu share',
+    }
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self.periods = dict()
+        self.periods_lock = Lock()
+        self.fds = dict()
+        self.applied = dict()
+        self.batches = queue.Queue()
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+
+    def start(self):
+        """ start actuator worker """
+        self.thread.start()
+
+    def _path(self, container, filename):
+        return path_join(self.prefix, container.parent_path,
+                         container.con_path, filename)
+
+    def get_cfs_period(self, container):
+        """
+        return CFS period of container, read once and cached afterwards
+            container - container to read period from
+        """
+        with self.periods_lock:
+            period = self.periods.get(container.cid)
+        if period is None:
+            path = self._path(container, 'cpu.cfs_period_us')
+            try:
+                with open(path) as perdf:
+                    period = int(perdf.readline())
+            except (ValueError, IOError, OSError):
+                return 0
+            with self.periods_lock:
+                self.periods[container.cid] = period
+        return period
+
+    def submit(self, writes):
+        """
+        queue one batch of cgroup writes
+            writes - list of (container, cgroup file name, value) tuples
+        """
+        self.batches.put(('write', writes))
+
+    def retain(self, cids):
+        """
+        drop cached state of containers not in given container ids
+            cids - container ids still running
+        """
+        self.batches.put(('retain', cids))
+
+    def _release(self, cid):
+        with self.periods_lock:
+            self.periods.pop(cid, None)
+        for key in [key for key in self.fds if key[0] == cid]:
+            os.close(self.fds.pop(key))
+            self.applied.pop(key, None)
+
+    def _write(self, container, filename, value):
+        key = (container.cid, filename)
+        data = str(value)
+        if self.applied.get(key) == data:
+            return
+        fd = self.fds.get(key)
+        if fd is None:
+            fd = os.open(self._path(container, filename), os.O_WRONLY)
+            self.fds[key] = fd
+        os.write(fd, data.encode())
+        self.applied[key] = data
+        print(datetime.now().isoformat(' ') + ' set container ' +
+              container.name + ' ' +
+              CgroupActuator.DESCRIPTIONS.get(filename, filename) +
+              ' to ' + data)
+
+    def _apply(self, pending):
+        for (cid, filename), (container, value) in pending.items():
+            try:
+                self._write(container, filename, value)
+            except (IOError, OSError) as e:
+                print('error in set container ' + container.name + ' ' +
+                      filename + ': ' + str(e))
+                self._release(cid)
+        pending.clear()
+
+    def _run(self):
+        pending = OrderedDict()
+        while True:
+            try:
+                self._process(pending)
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
+                pending.clear()
+
+    def _process(self, pending):
+        """ apply batches queued so far, coalesced into pending writes """
+        items = [self.batches.get()]
+        while True:
+            try:
+                items.append(self.batches.get_nowait())
+            except queue.Empty:
+                break
+        # batches queued meanwhile are coalesced, last value wins
+        for action, arg in items:
+            if action == 'write':
+                for container, filename, value in arg:
+                    pending[(container.cid, filename)] = (container, value)
+                continue
+            self._apply(pending)
+            cids = set(arg)
+            with self.periods_lock:
+                cached = set(self.periods)
+            for cid in (cached | {key[0] for key in self.fds}) - cids:
+                self._release(cid)
+        self._apply(pending)
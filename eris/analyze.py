@@ -21,10 +21,10 @@ from __future__ import print_function
 from __future__ import division
 
 import argparse
-import pandas as pd
 from container import Container, Contention
 from eris import remove_finished_containers, detect_contender
 from analyze.analyzer import Analyzer
+from analyze.columnar import read_frame
 
 
 def process_offline_data(args, analyzer):
@@ -34,7 +34,7 @@ def process_offline_data(args, analyzer):
     """
     metric_cons = dict()
 
-    mdf = pd.read_csv(args.metric_file)
+    mdf = read_frame(args.metric_file)
     key = 'cid' if args.key_cid else 'name'
     times = mdf['time'].unique()
     for time in times:
@@ -101,11 +101,11 @@ def main():
     parser.add_argument('-f', '--fense-type', help='fense type used in outlier\
                         detection', choices=['gmm-strict', 'gmm-normal'],
                         default='gmm-strict')
-    parser.add_argument('-m', '--metric-file', help='metrics file collected\
-                        from eris agent', type=argparse.FileType('rt'),
+    parser.add_argument('-m', '--metric-file', help='metrics csv file or\
+                        columnar record directory collected from eris agent',
                         default=Analyzer.METRIC_FILE)
-    parser.add_argument('-u', '--util-file', help='Utilization file collected\
-                        from eris agent', type=argparse.FileType('rt'),
+    parser.add_argument('-u', '--util-file', help='Utilization csv file or\
+                        columnar record directory collected from eris agent',
                         default=Analyzer.UTIL_FILE)
     parser.add_argument('-o', '--offline', help='do offline analysis based on\
                         given metrics file', action='store_true')
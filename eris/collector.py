@@ -0,0 +1,165 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements background platform metrics collection """
+
+from __future__ import print_function
+
+import sys
+import time
+import traceback
+
+from collections import namedtuple
+from threading import Event, Thread
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+Snapshot = namedtuple('Snapshot', ['timestamp', 'cids', 'samples'])
+
+
+class MetricCollector(object):
+    """
+    This class runs pgos collection in a dedicated worker thread and
+    publishes completed snapshots to a bounded queue, the oldest snapshot is
+    dropped and counted as overrun when the consumer falls behind. Between
+    two collections running counters are sampled every sub_interval seconds
+    if given, so that each snapshot carries percentiles of sub-intervals
+    """
+    SNAPSHOT_DEPTH = 2
+
+    def __init__(self, pgos, interval, timer, depth=SNAPSHOT_DEPTH,
+                 sub_interval=0):
+        self.pgos = pgos
+        self.interval = interval
+        self.sub_interval = sub_interval
+        self.timer = timer
+        self.cgroups = []
+        self.immediate = False
+        self.latest = None
+        self.overruns = 0
+        self.shutdown = Event()
+        self.wakeup = Event()
+        self.snapshots = queue.Queue(depth)
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+
+    def start(self):
+        """ start collection worker """
+        self.thread.start()
+
+    def stop(self):
+        """ stop collection worker and wait for current collection """
+        self.shutdown.set()
+        self.wakeup.set()
+        self.thread.join()
+
+    def set_interval(self, interval):
+        """
+        change collection interval, a pending wait is rescheduled at once
+            interval - collection interval in seconds
+        """
+        if interval != self.interval:
+            self.interval = interval
+            self.wakeup.set()
+
+    def update_cgroups(self, cgroups):
+        """
+        update cgroups collected from next collection on
+            cgroups - list of (container id, perf_event cgroup path, cpu list)
+                      tuples
+        """
+        first = cgroups and not self.cgroups
+        self.cgroups = cgroups
+        if first:
+            # first containers show up, collect them now not one interval late
+            self.immediate = True
+            self.wakeup.set()
+
+    def get(self, timeout=None):
+        """
+        wait for next completed snapshot
+            timeout - maximal seconds to wait, None if no snapshot landed
+        """
+        try:
+            return self.snapshots.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _publish(self, snapshot):
+        self.latest = snapshot
+        while True:
+            try:
+                self.snapshots.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self.snapshots.get_nowait()
+                    self.overruns += 1
+                    print('metrics consumer falls behind, snapshot dropped, ' +
+                          'overruns: ' + str(self.overruns))
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        next_time = time.time()
+        while not self.shutdown.is_set():
+            try:
+                with self.timer.phase('metric_collect'):
+                    timestamp, cids, samples = self.pgos.collect(self.cgroups)
+                self._publish(Snapshot(timestamp, cids, samples))
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
+            last_time = next_time
+            skipped = -1
+            while True:
+                next_time += self.interval
+                skipped += 1
+                delta = next_time - time.time()
+                if delta > 0:
+                    break
+            if skipped:
+                self.timer.record_tick('collector', skipped)
+            next_sample = time.time() + self.sub_interval
+            while delta > 0 and not self.shutdown.is_set():
+                timeout = delta
+                if self.sub_interval:
+                    timeout = max(min(delta, next_sample - time.time()), 0)
+                if self.wakeup.wait(timeout):
+                    # interval or cgroups changed, reschedule
+                    self.wakeup.clear()
+                    if self.immediate:
+                        self.immediate = False
+                        next_time = time.time()
+                    else:
+                        next_time = max(last_time + self.interval,
+                                        time.time())
+                elif self.sub_interval and time.time() >= next_sample:
+                    # a sub-interval too close to the next collection is
+                    # left to the collection itself
+                    if next_time - time.time() >= self.sub_interval / 2:
+                        self._sample()
+                    next_sample += self.sub_interval
+                delta = next_time - time.time()
+
+    def _sample(self):
+        try:
+            with self.timer.phase('metric_sample'):
+                self.pgos.sample()
+        except Exception:
+            traceback.print_exc(file=sys.stdout)
@@ -22,14 +22,27 @@ This module implements resource contention detection on one workload
 from __future__ import print_function
 from __future__ import division
 
-import time
-import multiprocessing
+import numpy as np
 
-from collections import deque
-from itertools import islice
+from collections import namedtuple
 from enum import Enum
 from os.path import join as path_join
-from analyze.analyzer import Metric
+try:
+    from os import cpu_count
+except ImportError:
+    from multiprocessing import cpu_count
+from analyze.metric import Metric
+
+HISTORY_METRICS = [Metric.INST, Metric.CYC, Metric.CPI, Metric.L3MPKI,
+                   Metric.L3MISS, Metric.NF, Metric.L3OCC, Metric.MBL,
+                   Metric.MBR, Metric.L2STALL, Metric.MEMSTALL,
+                   Metric.L2SPKI, Metric.MSPKI]
+HISTORY_COLUMNS = {metric: i for i, metric in enumerate(HISTORY_METRICS)}
+
+CPUSET_ROOT = '/sys/fs/cgroup/cpuset'
+
+UtilSample = namedtuple('UtilSample', ['timestamp', 'utils', 'cpu_usage',
+                                       'system_usage'])
 
 
 class Contention(Enum):
@@ -41,11 +54,45 @@ class Contention(Enum):
     TDP = 5
 
 
+def cgroup_paths(cgroup_driver, cid):
+    """
+    return docker cgroup parent path and container path of one container
+        cgroup_driver - docker cgroup driver type
+        cid - container id
+    """
+    if cgroup_driver == 'systemd':
+        return 'system.slice/', 'docker-' + cid + '.scope'
+    return 'docker/', cid
+
+
+def parse_cpus(cpus):
+    """
+    return cpu list of cpuset list format, like 0-3,8,10-11
+        cpus - cpu list string
+    """
+    result = []
+    for part in cpus.strip().split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        result.extend(range(int(first), int(last or first) + 1))
+    return result
+
+
 class Container(object):
     """
     This class is the abstraction of one task, container metrics and
-    contention detection method are encapsulated in this module
+    contention detection method are encapsulated in this module. Metrics
+    history is a fixed size ring buffer with one column per metric, running
+    column sums make history deltas independent of history depth.
+    CPU utilization state is written by util loop only as one immutable
+    sample, metric state is owned by metric loop
     """
+    __slots__ = ['cid', 'name', 'pids', 'pids_generation', 'util_sample',
+                 'thresh',
+                 'tdp_thresh', 'verbose', 'metrics', 'history_depth',
+                 'history', 'history_sums', 'history_len', 'history_pos',
+                 'cpusets', 'parent_path', 'con_path']
 
     def __init__(
             self, cgroup_driver, cid, name, pids, verbose,
@@ -53,27 +100,47 @@ class Container(object):
         self.cid = cid
         self.name = name
         self.pids = pids
-        self.cpu_usage = 0
-        self.system_usage = 0
-        self.utils = 0
-        self.timestamp = 0.0
+        self.pids_generation = 0
+        self.util_sample = UtilSample(0.0, 0, 0, 0)
         self.thresh = thresh
         self.tdp_thresh = tdp_thresh
         self.verbose = verbose
         self.metrics = dict()
         self.history_depth = history_depth + 1
-        self.metrics_history = deque([], self.history_depth)
+        self.history = np.zeros((self.history_depth, len(HISTORY_METRICS)))
+        self.history_sums = np.zeros(len(HISTORY_METRICS))
+        self.history_len = 0
+        self.history_pos = 0
         self.cpusets = []
-        if cgroup_driver == 'systemd':
-            self.con_path = 'docker-' + cid + '.scope'
-            self.parent_path = 'system.slice/'
-        else:
-            self.con_path = cid
-            self.parent_path = 'docker/'
+        self.parent_path, self.con_path = cgroup_paths(cgroup_driver, cid)
+
+    @property
+    def utils(self):
+        """ CPU utilization of latest util sample """
+        return self.util_sample.utils
+
+    @property
+    def timestamp(self):
+        """ time of latest util sample in nanoseconds """
+        return self.util_sample.timestamp
+
+    @property
+    def cpu_usage(self):
+        """ cgroup CPU usage of latest util sample """
+        return self.util_sample.cpu_usage
+
+    @property
+    def system_usage(self):
+        """ system CPU usage of latest util sample """
+        return self.util_sample.system_usage
 
     def __str__(self):
+        return ','.join(str(col) for col in self.metric_row()) + '\n'
+
+    def metric_row(self):
+        """ return recorded metrics columns of container """
         metrics = self.metrics
-        cols = [
+        return [
             metrics['time'],
             self.cid,
             self.name,
@@ -83,7 +150,7 @@ class Container(object):
             metrics[Metric.L3MPKI],
             metrics[Metric.L3MISS],
             metrics[Metric.NF],
-            self.utils,
+            metrics[Metric.UTIL],
             metrics[Metric.L3OCC],
             metrics[Metric.MBL],
             metrics[Metric.MBR],
@@ -92,7 +159,6 @@ class Container(object):
             metrics[Metric.L2SPKI],
             metrics[Metric.MSPKI],
         ]
-        return ','.join(str(col) for col in cols) + '\n'
 
     def update_metrics(self, row_tuple):
         key_mappings = [('time', str), (Metric.INST, int), (Metric.CYC, int),
@@ -101,23 +167,26 @@ class Container(object):
                         (Metric.L3OCC, int), (Metric.MBL, float),
                         (Metric.MBR, float), (Metric.L2STALL, int),
                         (Metric.MEMSTALL, int), (Metric.L2SPKI, float),
-                        (Metric.MSPKI, float)]
+                        (Metric.MSPKI, float), (Metric.UTIL, float)]
         for key, converter in key_mappings:
             self.metrics[key] = converter(row_tuple[1][key])
-        self.utils = float(row_tuple[1][Metric.UTIL])
         self.update_metrics_history()
 
     def get_history_delta_by_type(self, column_name):
-        length = len(self.metrics_history)
+        """
+        return difference between latest value of metric and average of
+        its earlier values in history
+            column_name - metric in HISTORY_METRICS
+        """
+        length = self.history_len
         if length == 0:
             return 0
+        column = HISTORY_COLUMNS[column_name]
+        latest = self.history[self.history_pos - 1, column].item()
         if length == 1:
-            return self.metrics_history[0][column_name]
-        data_sum = sum(m[column_name] for m in
-                       list(islice(self.metrics_history, length - 1)))
-        data_avg = float(data_sum) / (length - 1)
-        data_delta = self.metrics_history[-1][column_name] - data_avg
-        return data_delta
+            return latest
+        data_avg = (self.history_sums[column].item() - latest) / (length - 1)
+        return latest - data_avg
 
     def get_llcoccupany_delta(self):
         return self.get_history_delta_by_type(Metric.L3OCC)
@@ -131,146 +200,135 @@ class Container(object):
 
         return mbl + mbr
 
-    def get_full_metrics(self, timestamp, interval):
-        """ retrieve container platform metrics """
-        self.update_cpu_usage()
-        metrics = self.metrics
-        if self.metrics:
-            metrics['time'] = timestamp
-            if metrics[Metric.INST] == 0:
-                metrics[Metric.CPI] = 0
-                metrics[Metric.L3MPKI] = 0
-                metrics[Metric.L2SPKI] = 0
-                metrics[Metric.MSPKI] = 0
-            else:
-                metrics[Metric.CPI] = metrics[Metric.CYC] /\
-                    metrics[Metric.INST]
-                metrics[Metric.L3MPKI] = metrics[Metric.L3MISS] * 1000 /\
-                    metrics[Metric.INST]
-                metrics[Metric.L2SPKI] = metrics[Metric.L2STALL] * 1000 /\
-                    metrics[Metric.INST]
-                metrics[Metric.MSPKI] = metrics[Metric.MEMSTALL] * 1000 /\
-                    metrics[Metric.INST]
-            if self.utils == 0:
-                metrics[Metric.NF] = 0
-            else:
-                metrics[Metric.NF] = int(metrics[Metric.CYC] / interval /
-                                         10000 / self.utils)
-        return metrics
-
     def update_pids(self, pids):
         """
-        update process ids of one Container
+        update process ids of one Container, pids generation is increased
+        only when a different pid list is given
             pids - pid list of Container
         """
-        self.pids = pids
+        if pids is not self.pids:
+            self.pids = pids
+            self.pids_generation += 1
     
-    def update_cpu_usage(self):
-        """ calculate cpu usage of container """
+    def update_cpusets(self):
+        """
+        read cpus container may run on from its cpuset cgroup, cpusets is
+        left empty for containers not restricted to a subset of cores
+        """
         try:
-            total_usage = 0
-            system_usage = 0
-            cpu_util = 0.0
-            cur = time.time() * 1e9
-
-            with open("/proc/stat") as f:
-                stats = [int(e) for e in f.readline().split()[1:]]
-                system_usage = sum(stats) * 1e9 / 100
-
-            cgroup_stat = path_join('/sys/fs/cgroup/cpu', self.parent_path,
-                                  self.con_path, 'cpuacct.usage')
-            
-            with open(cgroup_stat, 'r') as fi:
-                total_usage = int(fi.read().strip())
-
-            cpu_delta = total_usage - self.cpu_usage
-            system_delta = system_usage - self.system_usage
-            cpu_no = multiprocessing.cpu_count()
-
-            if cpu_delta > 0 and system_delta > 0:
-                cpu_util = (float(cpu_delta) / system_delta) * cpu_no * 100
-            
-            self.timestamp = cur 
-            self.utils = cpu_util
-            self.cpu_usage = total_usage
-            self.system_usage = system_usage
-        except (ValueError, IOError):
-            pass
+            with open(path_join(CPUSET_ROOT, self.parent_path, self.con_path,
+                                'cpuset.cpus')) as cpusf:
+                cpus = parse_cpus(cpusf.read())
+        except (IOError, OSError, ValueError):
+            return
+        if len(cpus) == cpu_count():
+            cpus = []
+        self.cpusets = cpus
 
     def update_metrics_history(self):
         '''
         add metric data to metrics history
         metrics history only contains the most recent metrics data, defined by
-        self.historyDepth if histroy metrics data length exceeds the
-        self.historyDepth, the oldest data will be erased
+        self.history_depth, if history metrics data length exceeds the
+        self.history_depth, the oldest data will be overwritten
         '''
-        self.metrics_history.append(self.metrics.copy())
-
-    def __detect_in_bin(self, thresh):
         metrics = self.metrics
+        row = np.array([metrics.get(metric, 0) for metric in HISTORY_METRICS],
+                       dtype=np.float64)
+        pos = self.history_pos
+        if self.history_len == self.history_depth:
+            self.history_sums -= self.history[pos]
+        else:
+            self.history_len += 1
+        self.history[pos] = row
+        self.history_sums += row
+        pos = (pos + 1) % self.history_depth
+        self.history_pos = pos
+        if pos == 0:
+            # resum once per round to drop floating point drift
+            self.history_sums = self.history.sum(axis=0)
+
+    def __detect_in_bin(self, index):
+        metrics = self.metrics
+        table = self.thresh
         contend_res = []
-        if metrics[Metric.CPI] > thresh['cpi']:
-            unk_res = True
-            if metrics[Metric.L3MPKI] > thresh['mpki']:
-                print('Last Level Cache contention is detected at %s' %
-                      metrics['time'])
-                print('Latency critical container %s, CPI = %f, threshold =\
-%f, MPKI = %f, threshold = %f, L2SPKI = %f, threshold = %f' %
-                      (self.name, metrics[Metric.CPI], thresh['cpi'],
-                       metrics[Metric.L3MPKI], thresh['mpki'],
-                       metrics[Metric.L2SPKI], thresh['l2spki']))
-                unk_res = False
+        if metrics[Metric.CPI] > table.cpi[index]:
+            if metrics[Metric.L3MPKI] > table.mpki[index]:
                 contend_res.append(Contention.LLC)
-            if metrics[Metric.MBL] + metrics[Metric.MBR] < thresh['mb'] or\
-               metrics[Metric.MSPKI] > thresh['mspki']:
-                print('Memory Bandwidth contention detected at %s' %
-                      metrics['time'])
-                print('Latency critical container %s, CPI = %f, threshold =\
-%f, MBL = %f, MBR = %f, threshold = %f, MSPKI = %f, threshold = %f' %
-                      (self.name, metrics[Metric.CPI], thresh['cpi'],
-                       metrics[Metric.MBL], metrics[Metric.MBR], thresh['mb'],
-                       metrics[Metric.MSPKI], thresh['mspki']))
-                unk_res = False
+            if metrics[Metric.MBL] + metrics[Metric.MBR] < table.mb[index] or\
+               metrics[Metric.MSPKI] > table.mspki[index]:
                 contend_res.append(Contention.MEM_BW)
-            if unk_res:
-                print('Performance is impacted at %s' %
-                      metrics['time'])
-                print('Latency critical container %s, CPI = %f, threshold =\
-%f' % (self.name, metrics[Metric.CPI], thresh['cpi']))
+            if not contend_res:
                 contend_res.append(Contention.UNKN)
+            self.report_contention(table[index], contend_res)
 
         return contend_res
 
-    def tdp_contention_detect(self):
-        """ detect TDP contention in container """
-        if not self.tdp_thresh:
+    def report_contention(self, thresh, contends):
+        """
+        print detected contention of container
+            thresh - threshold bin contention is detected against
+            contends - detected contention types
+        """
+        metrics = self.metrics
+        if Contention.LLC in contends:
+            print('Last Level Cache contention is detected at %s' %
+                  metrics['time'])
+            print('Latency critical container %s, CPI = %f, threshold =\
+%f, MPKI = %f, threshold = %f, L2SPKI = %f, threshold = %f' %
+                  (self.name, metrics[Metric.CPI], thresh['cpi'],
+                   metrics[Metric.L3MPKI], thresh['mpki'],
+                   metrics[Metric.L2SPKI], thresh['l2spki']))
+        if Contention.MEM_BW in contends:
+            print('Memory Bandwidth contention detected at %s' %
+                  metrics['time'])
+            print('Latency critical container %s, CPI = %f, threshold =\
+%f, MBL = %f, MBR = %f, threshold = %f, MSPKI = %f, threshold = %f' %
+                  (self.name, metrics[Metric.CPI], thresh['cpi'],
+                   metrics[Metric.MBL], metrics[Metric.MBR], thresh['mb'],
+                   metrics[Metric.MSPKI], thresh['mspki']))
+        if Contention.UNKN in contends:
+            print('Performance is impacted at %s' %
+                  metrics['time'])
+            print('Latency critical container %s, CPI = %f, threshold =\
+%f' % (self.name, metrics[Metric.CPI], thresh['cpi']))
+
+    def covered(self, min_coverage):
+        """
+        return True if perf counters of container ran at least given ratio
+        of their enabled time, metrics without coverage are fully covered
+            min_coverage - minimal running/enabled time ratio
+        """
+        return self.metrics.get(Metric.COVERAGE, 1.0) >= min_coverage
+
+    def tdp_contention_detect(self, min_coverage=0.0):
+        """
+        detect TDP contention in container
+            min_coverage - skip detection below this PMU coverage
+        """
+        if not self.tdp_thresh or not self.covered(min_coverage):
             return None
 
         if self.verbose:
-            print(self.utils, self.metrics[Metric.NF], self.tdp_thresh['util'],
-                  self.tdp_thresh['bar'])
+            print(self.metrics[Metric.UTIL], self.metrics[Metric.NF],
+                  self.tdp_thresh['util'], self.tdp_thresh['bar'])
 
-        if self.utils >= self.tdp_thresh['util'] and\
+        if self.metrics[Metric.UTIL] >= self.tdp_thresh['util'] and\
            self.metrics[Metric.NF] < self.tdp_thresh['bar']:
             print('TDP Contention Alert!')
             return Contention.TDP
 
         return None
 
-    def contention_detect(self):
-        """ detect resouce contention after find proper utilization bin """
-        if not self.thresh:
+    def contention_detect(self, min_coverage=0.0):
+        """
+        detect resouce contention after find proper utilization bin
+            min_coverage - skip detection below this PMU coverage
+        """
+        if not self.thresh or not self.covered(min_coverage):
             return []
 
-        for i in range(0, len(self.thresh)):
-            thresh = self.thresh[i]
-            if self.utils < thresh['util_start']:
-                if i == 0:
-                    return []
-
-                return self.__detect_in_bin(self.thresh[i - 1])
-
-            if self.utils >= thresh['util_start']:
-                if self.utils < thresh['util_end'] or\
-                   i == len(self.thresh) - 1:
-                    return self.__detect_in_bin(thresh)
+        index = self.thresh.find(self.metrics[Metric.UTIL])
+        if index < 0:
+            return []
+        return self.__detect_in_bin(index)
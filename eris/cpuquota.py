@@ -20,8 +20,8 @@
 from __future__ import print_function
 from __future__ import division
 
-import subprocess
 from datetime import datetime
+from actuator import CgroupActuator
 from mresource import Resource
 
 
@@ -42,6 +42,8 @@ class CpuQuota(Resource):
         self.update_max_sys_util(sysMaxUtil)
         self.update()
         self.verbose = verbose
+        self.actuator = CgroupActuator(CpuQuota.PREFIX)
+        self.actuator.start()
 
     def update(self):
         if self.is_full_level():
@@ -60,54 +62,34 @@ class CpuQuota(Resource):
         self.quota_max = lc_max_util * CpuQuota.CPU_QUOTA_PERCENT
         self.quota_step = self.quota_max / Resource.BUGET_LEV_MAX
 
-    @staticmethod
-    def __get_cfs_period(container):
-        path = CpuQuota.PREFIX + container.parent_path + container.con_path +\
-                '/cpu.cfs_period_us'
-        with open(path) as perdf:
-            res = perdf.readline()
-        try:
-            period = int(res)
-            return period
-        except ValueError:
-            return 0
-
-    def __set_quota(self, container, quota):
-        period = self.__get_cfs_period(container)
+    def __quota_write(self, container, quota):
+        period = self.actuator.get_cfs_period(container)
         if period != 0 and quota != CpuQuota.CPU_QUOTA_DEFAULT\
            and quota != CpuQuota.CPU_QUOTA_MIN:
             rquota = int(quota * period / CpuQuota.CPU_QUOTA_CORE)
         else:
             rquota = quota
+        return (container, 'cpu.cfs_quota_us', rquota)
 
-        path = CpuQuota.PREFIX + container.parent_path +\
-            container.con_path + '/cpu.cfs_quota_us'
-        with open(path, 'w') as shrf:
-            shrf.write(str(rquota))
-        print(datetime.now().isoformat(' ') + ' set container ' +
-              container.name + ' cpu quota to ' + str(rquota))
-
-    @staticmethod
-    def set_share(container, share):
+    def set_share(self, container, share):
         """
         Set CPU share in container
             share - given CPU share value
         """
-        path = CpuQuota.PREFIX + container.parent_path +\
-            container.con_path + '/cpu.shares'
-        with open(path, 'w') as shrf:
-            shrf.write(str(share))
+        self.actuator.submit([(container, 'cpu.shares', share)])
 
-        print(datetime.now().isoformat(' ') + ' set container ' +
-              container.name + ' cpu share to ' + str(share))
+    def release(self, cids):
+        """
+        Release cached cgroup files of finished containers
+            cids - container ids still running
+        """
+        self.actuator.retain(cids)
 
     def budgeting(self, bes, lcs):
         newq = int(self.cpu_quota / len(bes))
-        for con in bes:
-            if self.is_min_level() or self.is_full_level():
-                self.__set_quota(con, self.cpu_quota)
-            else:
-                self.__set_quota(con, newq)
+        if self.is_min_level() or self.is_full_level():
+            newq = self.cpu_quota
+        self.actuator.submit([self.__quota_write(con, newq) for con in bes])
 
     def detect_margin_exceed(self, lc_utils, be_utils):
         """
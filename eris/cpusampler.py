@@ -0,0 +1,107 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements CPU utilization sampling of all containers """
+
+from __future__ import division
+
+import os
+import time
+
+import numpy as np
+
+from os.path import join as path_join
+from container import UtilSample
+try:
+    from os import cpu_count
+except ImportError:
+    from multiprocessing import cpu_count
+
+
+class CpuSampler(object):
+    """
+    This class samples CPU utilization of all containers in one pass, system
+    CPU time is read once per cycle and cpuacct.usage files are kept open
+    and read with pread. This is the only reader of container CPU usage, the
+    result is published to each container as one util sample
+    """
+    PROC_STAT = '/proc/stat'
+    CGROUP_CPU = '/sys/fs/cgroup/cpu'
+
+    def __init__(self):
+        self.cpu_no = cpu_count()
+        self.stat_fd = os.open(CpuSampler.PROC_STAT, os.O_RDONLY)
+        self.fds = dict()
+
+    def _read_system_usage(self):
+        line = os.pread(self.stat_fd, 512, 0).split(b'\n', 1)[0]
+        return sum(int(e) for e in line.split()[1:]) * 1e9 / 100
+
+    def _get_fd(self, container):
+        fd = self.fds.get(container.cid)
+        if fd is None:
+            path = path_join(CpuSampler.CGROUP_CPU, container.parent_path,
+                             container.con_path, 'cpuacct.usage')
+            fd = os.open(path, os.O_RDONLY)
+            self.fds[container.cid] = fd
+        return fd
+
+    def _read_usage(self, container):
+        try:
+            return int(os.pread(self._get_fd(container), 64, 0))
+        except (ValueError, OSError):
+            self._close(container.cid)
+            return -1
+
+    def _close(self, cid):
+        fd = self.fds.pop(cid, None)
+        if fd is not None:
+            os.close(fd)
+
+    def sample(self, containers):
+        """
+        update CPU utilization of given containers, cached files of
+        containers not given are closed
+            containers - all monitored containers
+        """
+        cids = {con.cid for con in containers}
+        for cid in [cid for cid in self.fds if cid not in cids]:
+            self._close(cid)
+        if not containers:
+            return
+
+        cur = time.time() * 1e9
+        system_usage = self._read_system_usage()
+        usages = np.array([self._read_usage(con) for con in containers],
+                          dtype=np.float64)
+        last_usages = np.array([con.cpu_usage for con in containers],
+                               dtype=np.float64)
+        last_system = np.array([con.system_usage for con in containers],
+                               dtype=np.float64)
+
+        cpu_delta = usages - last_usages
+        system_delta = system_usage - last_system
+        valid = (cpu_delta > 0) & (system_delta > 0)
+        utils = np.zeros(len(containers))
+        utils[valid] = cpu_delta[valid] / system_delta[valid] *\
+            self.cpu_no * 100
+
+        for i, con in enumerate(containers):
+            if usages[i] < 0:
+                continue
+            con.util_sample = UtilSample(cur, utils[i].item(), int(usages[i]),
+                                         system_usage)
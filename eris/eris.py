@@ -37,17 +37,39 @@ except ImportError:
     from multiprocessing import cpu_count
 from threading import Thread
 
+from collector import MetricCollector
 from container import Container, Contention
 from cpuquota import CpuQuota
+from cpusampler import CpuSampler
+from fleet import CONTENTIONS, FleetFrame
+from interval import AdaptiveInterval
 from llcoccup import LlcOccup
 from mresource import Resource
 from naivectrl import NaiveController
 from prometheus import PrometheusClient
 from pgos import Pgos
-from analyze.analyzer import Metric, Analyzer
+from registry import ContainerRegistry, ContainerTable
+from shard import ShardedPgos
+from threshwatch import ThresholdWatcher
+from timing import PhaseTimer
+from utilstate import LcUtilMaxState
+from analyze.columnar import ColumnarWriter
+from analyze.metric import Metric
+from analyze.threshold import ThresholdModel
 
 __version__ = 0.8
 
+UTIL_SCHEMA = [('time', str), ('cid', str), ('name', str),
+               (Metric.UTIL, np.float64)]
+METRIC_SCHEMA = [('time', np.int64), ('cid', str), ('name', str),
+                 (Metric.INST, np.int64), (Metric.CYC, np.int64),
+                 (Metric.CPI, np.float64), (Metric.L3MPKI, np.float64),
+                 (Metric.L3MISS, np.int64), (Metric.NF, np.float64),
+                 (Metric.UTIL, np.float64), (Metric.L3OCC, np.int64),
+                 (Metric.MBL, np.float64), (Metric.MBR, np.float64),
+                 (Metric.L2STALL, np.int64), (Metric.MEMSTALL, np.int64),
+                 (Metric.L2SPKI, np.float64), (Metric.MSPKI, np.float64)]
+
 
 class Context(object):
     """ This class encapsulate all configuration and args """
@@ -57,6 +79,7 @@ class Context(object):
         self._prometheus = None
         self.pgos = None
         self.pgos_inited = False
+        self.collector = None
         self.shutdown = False
         self.args = None
         self.sysmax_util = 0
@@ -65,9 +88,17 @@ class Context(object):
         self.cpuq = None
         self.llc = None
         self.controllers = {}
-        self.util_cons = dict()
-        self.metric_cons = dict()
+        self.containers = None
+        self.registry = None
+        self.sampler = None
+        self.timer = PhaseTimer()
+        self.util_writer = None
+        self.metric_writer = None
         self.analyzer = None
+        self.thresh_watcher = None
+        self.adaptive = None
+        self.thresh_generation = 0
+        self.lcutilmax = None
         self.cgroup_driver = 'cgroupfs'
 
     @property
@@ -79,7 +110,8 @@ class Context(object):
     @property
     def prometheus(self):
         if self._prometheus is None:
-            self._prometheus = PrometheusClient()
+            self._prometheus = PrometheusClient(self.args.prometheus_addr,
+                                                self.args.prometheus_port)
         return self._prometheus
 
 
@@ -106,16 +138,41 @@ def detect_contender(metric_cons, contention_type, container_contended):
           (contention_type, container_contended.name, suspect))
 
 
-def set_metrics(ctx, timestamp, data):
+def set_metrics(ctx, timestamp, cids, samples):
     """
     This function collect metrics from pgos tool and trigger resource
     contention detection and control
         ctx - agent context
-        data - metrics data collected from pgos
+        timestamp - collect time in seconds
+        cids - container ids collected from pgos
+        samples - pgos samples of those containers
+    return True if any LC container is close to its threshold
     """
-    for cid, metric in data:
-        container = ctx.metric_cons[cid]
-        container.metrics.update(metric)
+    timer = ctx.timer
+    rows = []
+    collected = []
+    for i, cid in enumerate(cids):
+        container = ctx.containers.get(cid)
+        if container is not None:
+            rows.append(i)
+            collected.append(container)
+
+    cons = ctx.containers.values('metric')
+    with timer.phase('metric_derive'):
+        frame = FleetFrame(collected, samples[rows])
+        frame.derive(timestamp)
+        if ctx.args.detect:
+            for con in frame.containers:
+                con.update_metrics_history()
+        full_metrics = [(con, con.metrics) for con in frame.containers]
+
+    if ctx.args.enable_prometheus:
+        with timer.phase('metric_export'):
+            ctx.prometheus.update_snapshot(full_metrics)
+
+    if ctx.args.record:
+        with timer.phase('metric_record'):
+            record_metrics(ctx, full_metrics)
 
     contention = {
         Contention.LLC: False,
@@ -125,68 +182,67 @@ def set_metrics(ctx, timestamp, data):
     contention_map = {}
     bes = []
     lcs = []
-    findbe = False
-    for cid, con in ctx.metric_cons.items():
-        key = con.cid if ctx.args.key_cid else con.name
-        metrics = con.get_full_metrics(timestamp, ctx.args.metric_interval)
-        if metrics:
-            if ctx.args.detect:
-                con.update_metrics_history()
-
-            if ctx.args.record:
-                with open(Analyzer.METRIC_FILE, 'a') as metricf:
-                    metricf.write(str(con))
-
-                if ctx.args.enable_prometheus:
-                    ctx.prometheus.send_metrics(con.name, con.utils,
-                                                metrics[Metric.CYC],
-                                                metrics[Metric.L3MISS],
-                                                metrics[Metric.INST],
-                                                metrics[Metric.CPI],
-                                                metrics[Metric.L3MPKI],
-                                                metrics[Metric.MSPKI],
-                                                metrics[Metric.NF],
-                                                metrics[Metric.MBR] +
-                                                metrics[Metric.MBL],
-                                                metrics[Metric.L3OCC])
-
-        if key in ctx.lc_set:
-            if ctx.args.exclusive_cat:
+    near = False
+    with timer.phase('metric_detect'):
+        for con in cons:
+            key = con.cid if ctx.args.key_cid else con.name
+            if key in ctx.lc_set and ctx.args.exclusive_cat:
                 lcs.append(con)
-            if metrics:
-                if ctx.args.detect:
-                    contend_res = con.contention_detect()
-                    if_contended = False
-
-                    if contend_res:
-                        if_contended = True
-                        for contend in contend_res:
-                            contention[contend] = True
-
-                    tdp_contend = con.tdp_contention_detect()
-                    if tdp_contend is not None:
-                        if_contended = True
-                        contention[tdp_contend] = True
-
-                    if if_contended:
-                        contention_map[con] = contention.copy()
-
-        if key in ctx.be_set:
-            findbe = True
-            bes.append(con)
+            if key in ctx.be_set:
+                bes.append(con)
+        if len(frame) and (ctx.args.detect or ctx.adaptive):
+            lc_mask = np.array([(con.cid if ctx.args.key_cid else con.name)
+                                in ctx.lc_set for con in frame.containers])
+            if ctx.adaptive:
+                near = frame.near_threshold(lc_mask, ctx.args.adaptive_margin)
+        if ctx.args.detect and len(frame):
+            matrix = frame.detect(lc_mask, ctx.args.verbose,
+                                  ctx.args.min_coverage, ctx.args.detect_stat)
+            for contention_type, flag in zip(CONTENTIONS, matrix.any(axis=0)):
+                if flag:
+                    contention[contention_type] = True
+            # contention flags seen so far in the cycle go with each container
+            seen = np.logical_or.accumulate(matrix, axis=0)
+            for i in np.flatnonzero(matrix.any(axis=1)):
+                contention_map[frame.containers[i]] = {
+                    contention_type: bool(flag) for contention_type, flag
+                    in zip(CONTENTIONS, seen[i])}
 
     if ctx.args.detect:
-        for container_contended, contention_list in contention_map.items():
-            for contention_type, contention_type_if_happened\
-                    in contention_list.items():
-                if contention_type_if_happened and\
-                   contention_type != Contention.UNKN:
-                    detect_contender(ctx.metric_cons, contention_type,
-                                     container_contended)
-    if findbe and ctx.args.control:
-        for contention, flag in contention.items():
-            if contention in ctx.controllers:
-                ctx.controllers[contention].update(bes, lcs, flag, False)
+        with timer.phase('metric_contender'):
+            for container_contended, contention_list in\
+                    contention_map.items():
+                for contention_type, contention_type_if_happened\
+                        in contention_list.items():
+                    if contention_type_if_happened and\
+                       contention_type != Contention.UNKN:
+                        detect_contender(ctx.containers, contention_type,
+                                         container_contended)
+    if bes and ctx.args.control:
+        with timer.phase('metric_control'):
+            for contention, flag in contention.items():
+                if contention in ctx.controllers:
+                    acted = ctx.controllers[contention].update(bes, lcs, flag,
+                                                               False)
+                    if acted and ctx.adaptive:
+                        ctx.adaptive.control_acted()
+    return near
+
+
+def record_metrics(ctx, full_metrics):
+    """
+    record platform metrics of containers in metrics file
+        ctx - agent context
+        full_metrics - list of (container, full metrics of container) tuples
+    """
+    if ctx.metric_writer:
+        for con, _ in full_metrics:
+            ctx.metric_writer.append(con.metric_row())
+        ctx.metric_writer.end_cycle()
+    else:
+        with open(ThresholdModel.METRIC_FILE, 'a') as metricf:
+            for con, _ in full_metrics:
+                metricf.write(str(con))
 
 
 def remove_finished_containers(cids, consmap):
@@ -200,24 +256,45 @@ def remove_finished_containers(cids, consmap):
             del consmap[cid]
 
 
-def list_tids(pid):
-    tids = []
-    try:
-        tids = os.listdir('/proc/' + pid + '/task')
-    except Exception:
-        traceback.print_exc(file=sys.stdout)
-    return tids
+def new_container(ctx, entry):
+    """
+    create container shared by monitor loops from registry entry
+        ctx - agent context
+        entry - registry entry of running container
+    """
+    return Container(ctx.cgroup_driver, entry.cid, entry.name, [],
+                     ctx.args.verbose, ctx.analyzer.get_thresh(entry.key),
+                     ctx.analyzer.get_tdp_thresh(entry.key),
+                     ctx.args.history_depth)
+
+
+def rename_container(ctx, container, entry):
+    """
+    update container renamed in Docker, its thresholds are looked up again
+    as they may be keyed by name
+        ctx - agent context
+        container - container shared by monitor loops
+        entry - registry entry of renamed container
+    """
+    print('container %s is renamed to %s' % (container.name, entry.name))
+    container.name = entry.name
+    container.thresh = ctx.analyzer.get_thresh(entry.key)
+    container.tdp_thresh = ctx.analyzer.get_tdp_thresh(entry.key)
 
 
-def list_pids(container):
+def record_utils(ctx, rows):
     """
-    list all process id of one container
-        container - container object listed from Docker
+    record CPU utilization rows in utilization file
+        ctx - agent context
+        rows - list of [time, cid, name, utilization] rows
     """
-    procs = container.top()['Processes']
-    pids = [pid[1] for pid in procs] if procs else []
-    return [tid for pid in pids
-            for tid in list_tids(pid)] if pids else []
+    if ctx.util_writer:
+        for row in rows:
+            ctx.util_writer.append(row)
+    else:
+        with open(ThresholdModel.UTIL_FILE, 'a') as utilf:
+            for row in rows:
+                utilf.write(','.join(str(col) for col in row) + '\n')
 
 
 def mon_util_cycle(ctx):
@@ -231,32 +308,31 @@ def mon_util_cycle(ctx):
     date = datetime.now().isoformat()
     bes = []
     newbe = False
-    containers = ctx.docker_client.containers.list()
-    remove_finished_containers({c.id for c in containers}, ctx.util_cons)
-
-    for container in containers:
-        cid = container.id
-        name = container.name
-        pids = list_pids(container)
-        key = cid if ctx.args.key_cid else name
-        if cid in ctx.util_cons:
-            con = ctx.util_cons[cid]
-        else:
-            con = Container(ctx.cgroup_driver, cid, name, pids,
-                            ctx.args.verbose)
-            ctx.util_cons[cid] = con
-            if ctx.args.control:
-                if key in ctx.be_set:
+    timer = ctx.timer
+
+    with timer.phase('util_list'):
+        entries, cons, added, removed = ctx.containers.sync('util')
+        if ctx.args.control and removed:
+            ctx.cpuq.release({con.cid for con in cons})
+        for entry, con in zip(entries, cons):
+            if con in added and ctx.args.control:
+                if entry.key in ctx.be_set:
                     newbe = True
                     ctx.cpuq.set_share(con, CpuQuota.CPU_SHARE_BE)
                 else:
                     ctx.cpuq.set_share(con, CpuQuota.CPU_SHARE_LC)
-        con.update_cpu_usage()
-        if ctx.args.record:
-            with open(Analyzer.UTIL_FILE, 'a') as utilf:
-                utilf.write(date + ',' + cid + ',' + name +
-                            ',' + str(con.utils) + '\n')
 
+    with timer.phase('util_sample'):
+        ctx.sampler.sample(cons)
+
+    if ctx.args.record:
+        with timer.phase('util_record'):
+            rows = [[date, entry.cid, entry.name, con.utils]
+                    for entry, con in zip(entries, cons)]
+            record_utils(ctx, rows)
+
+    for entry, con in zip(entries, cons):
+        key = entry.key
         if key in ctx.lc_set:
             lc_utils = lc_utils + con.utils
 
@@ -267,72 +343,101 @@ def mon_util_cycle(ctx):
 
     loadavg = os.getloadavg()[0]
     if ctx.args.record:
-        with open(Analyzer.UTIL_FILE, 'a') as utilf:
-            utilf.write(date + ',,lcs,' + str(lc_utils) + '\n')
-            utilf.write(date + ',,loadavg1m,' + str(loadavg) + '\n')
+        record_utils(ctx, [[date, '', 'lcs', lc_utils],
+                           [date, '', 'loadavg1m', loadavg]])
+        if ctx.util_writer:
+            ctx.util_writer.end_cycle()
 
     if lc_utils > ctx.sysmax_util:
         ctx.sysmax_util = lc_utils
-        ctx.analyzer.update_lcutilmax(lc_utils)
+        ctx.lcutilmax.update(lc_utils)
         if ctx.args.control:
             ctx.cpuq.update_max_sys_util(lc_utils)
 
-    if newbe:
-        ctx.cpuq.budgeting(bes, [])
+    with timer.phase('util_control'):
+        if newbe:
+            ctx.cpuq.budgeting(bes, [])
 
-    if findbe and ctx.args.control:
-        exceed, hold = ctx.cpuq.detect_margin_exceed(lc_utils, be_utils)
-        if not ctx.args.enable_hold:
-            hold = False
-        ctx.controllers[Contention.CPU_CYC].update(bes, [], exceed, hold)
+        if findbe and ctx.args.control:
+            exceed, hold = ctx.cpuq.detect_margin_exceed(lc_utils, be_utils)
+            if not ctx.args.enable_hold:
+                hold = False
+            acted = ctx.controllers[Contention.CPU_CYC].update(bes, [],
+                                                               exceed, hold)
+            if acted and ctx.adaptive:
+                ctx.adaptive.control_acted()
 
 
 def mon_metric_cycle(ctx):
     """
-    Platform metrics monitor timer function
+    Platform metrics monitor function, refresh cgroups collected by metric
+    collector and process the next snapshot as soon as it lands
         ctx - agent context
     """
-    containers = ctx.docker_client.containers.list()
     cgroups = []
     bes = []
     lcs = []
     newcon = False
     newbe = False
-    remove_finished_containers({c.id for c in containers}, ctx.metric_cons)
-
-    for container in containers:
-        cid = container.id
-        name = container.name
-        pids = list_pids(container)
-        key = cid if ctx.args.key_cid else name
-        if cid in ctx.metric_cons:
-            con = ctx.metric_cons[cid]
-            con.update_pids(pids)
-        else:
-            thresh = ctx.analyzer.get_thresh(key)
-            tdp_thresh = ctx.analyzer.get_tdp_thresh(key)
-            con = Container(ctx.cgroup_driver, cid, name, pids,
-                            ctx.args.verbose, thresh, tdp_thresh)
-            ctx.metric_cons[cid] = con
-            con.update_cpu_usage()
-            if ctx.args.control and not ctx.args.disable_cat:
-                newcon = True
-                if key in ctx.be_set:
-                    newbe = True
+    timer = ctx.timer
+    with timer.phase('metric_list'):
+        entries, cons, added, _ = ctx.containers.sync('metric')
+
+    with timer.phase('metric_resolve_pids'):
+        tids = [entry.tasks.resolve() for entry in entries]
+
+    refresh_thresholds(ctx)
+
+    for entry, con, pids in zip(entries, cons, tids):
+        key = entry.key
+        con.update_pids(pids)
+        if con in added and ctx.args.control and not ctx.args.disable_cat:
+            newcon = True
+            if key in ctx.be_set:
+                newbe = True
         if key in ctx.lc_set:
             if ctx.args.exclusive_cat:
                 lcs.append(con)
         if key in ctx.be_set:
             bes.append(con)
-        cgroups.append((cid, '/sys/fs/cgroup/perf_event/' +
-                        con.parent_path + con.con_path))
+        con.update_cpusets()
+        cgroups.append((entry.cid, entry.perf_path, con.cpusets))
     if newbe or newcon and bes and ctx.args.exclusive_cat:
-        ctx.llc.budgeting(bes, lcs)
-
-    if cgroups:
-        timestamp, data = ctx.pgos.collect(cgroups)
-        if data:
-            set_metrics(ctx, timestamp, data)
+        with timer.phase('metric_control'):
+            ctx.llc.budgeting(bes, lcs)
+    elif ctx.args.control and not ctx.args.disable_cat:
+        with timer.phase('metric_control'):
+            ctx.llc.update_tasks(bes, lcs)
+
+    ctx.collector.update_cgroups(cgroups)
+
+    snapshot = ctx.collector.get(ctx.collector.interval)
+    if snapshot is not None and snapshot.cids:
+        near = set_metrics(ctx, snapshot.timestamp // 1000000000,
+                           snapshot.cids, snapshot.samples)
+        if ctx.adaptive:
+            interval = ctx.adaptive.update(near)
+            ctx.collector.set_interval(interval)
+            if ctx.args.enable_prometheus:
+                ctx.prometheus.set_metric_interval(interval)
+    elif snapshot is not None and ctx.args.enable_prometheus:
+        # no container left, drop series of containers gone away
+        ctx.prometheus.update_snapshot([])
+
+
+def refresh_thresholds(ctx):
+    """
+    swap reloaded threshold model into monitored containers
+        ctx - agent context
+    """
+    generation = ctx.analyzer.generation
+    if generation == ctx.thresh_generation:
+        return
+    for con in ctx.containers.values():
+        key = con.cid if ctx.args.key_cid else con.name
+        con.thresh = ctx.analyzer.get_thresh(key)
+        con.tdp_thresh = ctx.analyzer.get_tdp_thresh(key)
+    ctx.thresh_generation = generation
 
 
 def monitor(func, ctx, interval):
@@ -344,14 +449,35 @@ def monitor(func, ctx, interval):
     next_time = time.time()
     while not ctx.shutdown:
         func(ctx)
+        skipped = -1
         while True:
             next_time += interval
+            skipped += 1
             delta = next_time - time.time()
             if delta > 0:
                 break
+        if skipped:
+            ctx.timer.record_tick(func.__name__, skipped)
         time.sleep(delta)
 
 
+def log_timing_summary(ctx):
+    """
+    Phase timing summary timer function
+        ctx - agent context
+    """
+    print(ctx.timer.summary())
+
+
+def consume(func, ctx):
+    """
+    wrap event driven function, which blocks until its next event
+        ctx - agent context
+    """
+    while not ctx.shutdown:
+        func(ctx)
+
+
 def init_wlset(ctx):
     """
     Initialize workload set for both LC and BE
@@ -373,10 +499,12 @@ def init_wlset(ctx):
 
 def init_sysmax(ctx):
     """
-    Initialize historical LC tasks maximal utilization from model file
+    Initialize historical LC tasks maximal utilization from model file and
+    LC utilization state file
         ctx - agent context
     """
-    ctx.sysmax_util = ctx.analyzer.get_lcutilmax()
+    ctx.lcutilmax = LcUtilMaxState(period=ctx.args.lcutilmax_flush)
+    ctx.sysmax_util = max(ctx.analyzer.get_lcutilmax(), ctx.lcutilmax.value)
     if ctx.sysmax_util == 0:
         ctx.sysmax_util = cpu_count() * 100
     if ctx.args.verbose:
@@ -427,11 +555,42 @@ def parse_arguments():
                         in resource regulation', action='store_true')
     parser.add_argument('-p', '--enable-prometheus', help='allow eris send\
                         metrics to Prometheus', action='store_true')
+    parser.add_argument('--prometheus-addr', help='address Prometheus\
+                        metrics endpoint binds to, all addresses if not\
+                        given', default='')
+    parser.add_argument('--prometheus-port', help='port Prometheus metrics\
+                        endpoint listens on', type=int, default=8080)
     parser.add_argument('-u', '--util-interval', help='CPU utilization monitor\
                         interval', type=int, choices=range(1, 11), default=2)
     parser.add_argument('-m', '--metric-interval', help='platform metrics\
                         monitor interval', type=int, choices=range(2, 61),
                         default=20)
+    parser.add_argument('--metric-sub-interval', help='interval in seconds\
+                        of sampling running counters within one platform\
+                        metrics interval, 0 to disable', type=float,
+                        default=0)
+    parser.add_argument('--detect-stat', help='statistic of CPI, MPKI and\
+                        memory bandwidth compared to thresholds, interval\
+                        mean or percentile of sub-intervals, memory bandwidth\
+                        uses the matching low percentile',
+                        choices=FleetFrame.STATS, default='mean')
+    parser.add_argument('--adaptive-interval', help='adapt platform metrics\
+                        monitor interval between minimum and maximum to\
+                        proximity of LC workloads to their thresholds',
+                        action='store_true')
+    parser.add_argument('--metric-interval-min', help='minimal adaptive\
+                        platform metrics monitor interval', type=int,
+                        default=2)
+    parser.add_argument('--metric-interval-max', help='maximal adaptive\
+                        platform metrics monitor interval', type=int,
+                        default=60)
+    parser.add_argument('--adaptive-margin', help='margin ratio related to\
+                        CPI and MPKI threshold under which LC workloads are\
+                        close to contention', type=float, default=0.1)
+    parser.add_argument('--min-coverage', help='minimal ratio of time perf\
+                        counters of a container run while enabled, contention\
+                        of containers below it is not reported', type=float,
+                        default=0.0)
     parser.add_argument('-l', '--llc-cycles', help='cycle number in LLC\
                         controller', type=int, default=6)
     parser.add_argument('-q', '--quota-cycles', help='cycle number in CPU CFS\
@@ -439,10 +598,39 @@ def parse_arguments():
     parser.add_argument('-k', '--margin-ratio', help='margin ratio related to\
                         one logical processor used in CPU cycle regulation',
                         type=float, default=0.5)
+    parser.add_argument('--history-depth', help='metric cycles averaged\
+                        as baseline of history delta in contender\
+                        detection', type=int, default=5)
+    parser.add_argument('--lcutilmax-flush', help='minimal interval in\
+                        seconds between two writes of maximal LC utilization\
+                        state file', type=int, default=30)
     parser.add_argument('-t', '--thresh-file', help='threshold model file build\
-                        from analyze.py tool', default=Analyzer.THRESH_FILE)
+                        from analyze.py tool',
+                        default=ThresholdModel.THRESH_FILE)
+    parser.add_argument('--thresh-reload', help='interval in seconds to\
+                        check threshold model file for change and reload it,\
+                        0 to disable', type=int, default=10)
+    parser.add_argument('-f', '--record-format', help='format of recorded\
+                        data, csv files or compressed columnar chunks',
+                        choices=['csv', 'columnar'], default='csv')
+    parser.add_argument('-b', '--record-flush', help='cycle number buffered\
+                        before recorded columnar data is written', type=int,
+                        default=10)
+    parser.add_argument('--shards', help='number of worker processes\
+                        collecting platform metrics, 0 to collect in agent\
+                        process', type=int, default=0)
+    parser.add_argument('--shard-capacity', help='maximal number of\
+                        containers collected by one worker process', type=int,
+                        default=ShardedPgos.SHARD_CAPACITY)
+    parser.add_argument('-s', '--timing-summary', help='interval in seconds\
+                        to log monitor loop phase timing summary, 0 to\
+                        disable', type=int, default=0)
 
     args = parser.parse_args()
+    if args.metric_interval_min <= 0 or args.metric_interval_max <= 0:
+        parser.error('metric interval bounds must be positive')
+    if args.metric_interval_min > args.metric_interval_max:
+        parser.error('minimal metric interval exceeds maximal one')
     if args.verbose:
         print(args)
     return args
@@ -464,49 +652,89 @@ def main():
     ctx = Context()
     ctx.args = parse_arguments()
     ctx.cgroup_driver = detect_cgroup_driver()
-    ctx.analyzer = Analyzer(ctx.args.workload_conf_file,
-                            ctx.args.thresh_file)
+    ctx.analyzer = ThresholdModel(ctx.args.workload_conf_file,
+                                  ctx.args.thresh_file)
     init_wlset(ctx)
     init_sysmax(ctx)
+    ctx.lcutilmax.start()
 
     if ctx.args.enable_prometheus:
         ctx.prometheus.start()
+        ctx.timer = PhaseTimer(ctx.prometheus)
+
+    if ctx.args.thresh_reload:
+        ctx.thresh_watcher = ThresholdWatcher(
+            ctx.analyzer, ctx.args.thresh_reload,
+            ctx.prometheus if ctx.args.enable_prometheus else None)
+        ctx.thresh_watcher.start()
 
     if ctx.args.control:
         ctx.cpuq = CpuQuota(ctx.sysmax_util, ctx.args.margin_ratio,
                             ctx.args.verbose)
         quota_controller = NaiveController(ctx.cpuq, ctx.args.quota_cycles)
-        ctx.llc = LlcOccup(Resource.BUGET_LEV_MIN, ctx.args.exclusive_cat)
-        llc_controller = NaiveController(ctx.llc, ctx.args.llc_cycles)
         if ctx.args.disable_cat:
-            ctx.llc = LlcOccup(Resource.BUGET_LEV_FULL, exclusive=False)
             ctx.controllers = {Contention.CPU_CYC: quota_controller}
         else:
+            ctx.llc = LlcOccup(Resource.BUGET_LEV_MIN, ctx.args.exclusive_cat)
+            llc_controller = NaiveController(ctx.llc, ctx.args.llc_cycles)
             ctx.controllers = {Contention.CPU_CYC: quota_controller,
                                Contention.LLC: llc_controller}
     if ctx.args.record:
-        cols = ['time', 'cid', 'name', Metric.UTIL]
-        init_data_file(ctx, Analyzer.UTIL_FILE, cols)
+        if ctx.args.record_format == 'columnar':
+            ctx.util_writer = ColumnarWriter(ThresholdModel.UTIL_RECORD,
+                                             UTIL_SCHEMA,
+                                             ctx.args.record_flush)
+        else:
+            init_data_file(ctx, ThresholdModel.UTIL_FILE,
+                           [col for col, _ in UTIL_SCHEMA])
+    ctx.registry = ContainerRegistry(ctx.docker_client, ctx.cgroup_driver,
+                                     ctx.args.key_cid)
+    ctx.registry.start()
+    ctx.containers = ContainerTable(
+        ctx.registry, lambda entry: new_container(ctx, entry),
+        lambda con, entry: rename_container(ctx, con, entry))
+    ctx.sampler = CpuSampler()
     threads = [Thread(target=monitor, args=(mon_util_cycle,
                                             ctx, ctx.args.util_interval))]
 
     if ctx.args.collect_metrics:
         if ctx.args.record:
-            cols = ['time', 'cid', 'name', Metric.INST, Metric.CYC,
-                    Metric.CPI, Metric.L3MPKI, Metric.L3MISS, Metric.NF,
-                    Metric.UTIL, Metric.L3OCC, Metric.MBL, Metric.MBR,
-                    Metric.L2STALL, Metric.MEMSTALL, Metric.L2SPKI,
-                    Metric.MSPKI]
-            init_data_file(ctx, Analyzer.METRIC_FILE, cols)
-        ctx.pgos = Pgos(cpu_count(), ctx.args.metric_interval * 1000 - 1500)
+            if ctx.args.record_format == 'columnar':
+                ctx.metric_writer = ColumnarWriter(
+                    ThresholdModel.METRIC_RECORD, METRIC_SCHEMA,
+                    ctx.args.record_flush)
+            else:
+                init_data_file(ctx, ThresholdModel.METRIC_FILE,
+                               [col for col, _ in METRIC_SCHEMA])
+        if ctx.args.shards:
+            ctx.pgos = ShardedPgos(cpu_count(), ctx.args.shards,
+                                   ctx.args.shard_capacity)
+        else:
+            ctx.pgos = Pgos(cpu_count())
         ret = ctx.pgos.init_pgos()
         if ret != 0:
             print('error in libpgos init, error code: ' + str(ret))
         else:
             ctx.pgos_inited = True
+        interval = ctx.args.metric_interval
+        if ctx.args.adaptive_interval:
+            ctx.adaptive = AdaptiveInterval(ctx.args.metric_interval_min,
+                                            ctx.args.metric_interval_max,
+                                            interval)
+            interval = ctx.adaptive.interval
+        if ctx.args.enable_prometheus:
+            ctx.prometheus.set_metric_interval(interval)
+        ctx.collector = MetricCollector(
+            ctx.pgos, interval, ctx.timer,
+            sub_interval=ctx.args.metric_sub_interval)
+        ctx.collector.start()
+        threads.append(Thread(target=consume,
+                              args=(mon_metric_cycle, ctx)))
+
+    if ctx.args.timing_summary:
         threads.append(Thread(target=monitor,
-                              args=(mon_metric_cycle,
-                                    ctx, ctx.args.metric_interval)))
+                              args=(log_timing_summary,
+                                    ctx, ctx.args.timing_summary)))
 
     for thread in threads:
         thread.start()
@@ -518,9 +746,18 @@ def main():
             thread.join()
     except KeyboardInterrupt:
         print('Shutdown eris agent ...exiting')
+        ctx.registry.stop()
+        if ctx.thresh_watcher:
+            ctx.thresh_watcher.stop()
+        ctx.lcutilmax.stop()
+        if ctx.collector:
+            ctx.collector.stop()
         if ctx.pgos_inited:
             ctx.pgos.fin_pgos()
         ctx.shutdown = True
+        for writer in (ctx.util_writer, ctx.metric_writer):
+            if writer:
+                writer.flush()
     except Exception:
         traceback.print_exc(file=sys.stdout)
 
@@ -0,0 +1,221 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module implements columnar platform metrics of all containers in one
+monitor cycle, derived metrics and contention detection are computed in
+vectorized passes over the whole fleet
+"""
+
+from __future__ import print_function
+from __future__ import division
+
+import numpy as np
+
+from container import Contention
+from analyze.metric import Metric
+from analyze.threshold import ThresholdTable
+
+CONTENTIONS = [Contention.LLC, Contention.MEM_BW, Contention.UNKN,
+               Contention.TDP]
+
+
+class FleetFrame(object):
+    """
+    This class holds platform metrics of one cycle in a structured array
+    with one row per container collected by pgos
+    """
+    # frame column, metric key and pgos sample field of collected values
+    COUNTERS = [('inst', Metric.INST, 'instructions'),
+                ('cyc', Metric.CYC, 'cycles'),
+                ('l3miss', Metric.L3MISS, 'llc_misses'),
+                ('l2stall', Metric.L2STALL, 'stalls_l2_misses'),
+                ('memstall', Metric.MEMSTALL, 'stalls_memory_load'),
+                ('l3occ', Metric.L3OCC, 'llc_occupancy'),
+                ('mbl', Metric.MBL, 'mbm_local'),
+                ('mbr', Metric.MBR, 'mbm_remote'),
+                ('coverage', Metric.COVERAGE, 'coverage')]
+    # percentiles of sub-intervals, copied as is from pgos samples
+    PERCENTILES = ['cpi_p50', 'cpi_p95', 'cpi_max', 'mpki_p50', 'mpki_p95',
+                   'mpki_max', 'mb_p50', 'mb_p5', 'mb_min']
+    # statistics of CPI, MPKI and memory bandwidth detection can run on
+    STATS = ['mean', 'p50', 'p95', 'max']
+    # memory bandwidth contention is low bandwidth, its statistic matching
+    # a high side CPI and MPKI statistic is the low side one
+    MB_STATS = {'p50': 'mb_p50', 'p95': 'mb_p5', 'max': 'mb_min'}
+    DERIVED = [('cpi', Metric.CPI), ('l3mpki', Metric.L3MPKI),
+               ('l2spki', Metric.L2SPKI), ('mspki', Metric.MSPKI),
+               ('nf', Metric.NF)]
+    # columns stored back to container metrics after derivation
+    STORED = DERIVED + [('util', Metric.UTIL)]
+    DTYPE = np.dtype([('inst', np.float64), ('cyc', np.float64),
+                      ('l3miss', np.float64), ('l2stall', np.float64),
+                      ('memstall', np.float64), ('l3occ', np.float64),
+                      ('mbl', np.float64), ('mbr', np.float64),
+                      ('coverage', np.float64), ('interval', np.float64),
+                      ('util', np.float64),
+                      ('cpi', np.float64), ('l3mpki', np.float64),
+                      ('l2spki', np.float64), ('mspki', np.float64),
+                      ('nf', np.float64)] +
+                     [(field, np.float64) for field in PERCENTILES])
+
+    def __init__(self, containers, samples):
+        """
+            containers - containers of this cycle
+            samples - pgos samples of containers, one row per container
+        """
+        self.containers = containers
+        self.samples = samples
+        frame = np.zeros(len(containers), dtype=FleetFrame.DTYPE)
+        for field, _, source in FleetFrame.COUNTERS:
+            frame[field] = samples[source]
+        for field in FleetFrame.PERCENTILES:
+            frame[field] = samples[field]
+        frame['interval'] = samples['interval'] / 1e9
+        # utilization is read once from the latest util sample
+        frame['util'] = [con.utils for con in containers]
+        self.frame = frame
+        self.limits = None
+
+    def __len__(self):
+        return len(self.containers)
+
+    def derive(self, timestamp):
+        """
+        compute derived metrics of all rows and store them back to metrics
+        of each container along with collected counters
+            timestamp - collect time in seconds
+        """
+        frame = self.frame
+        inst = frame['inst']
+        valid = inst > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frame['cpi'] = np.where(valid, frame['cyc'] / inst, 0)
+            frame['l3mpki'] = np.where(valid, frame['l3miss'] * 1000 / inst,
+                                       0)
+            frame['l2spki'] = np.where(valid, frame['l2stall'] * 1000 / inst,
+                                       0)
+            frame['mspki'] = np.where(valid, frame['memstall'] * 1000 / inst,
+                                      0)
+            frame['nf'] = np.where(frame['util'] != 0,
+                                   np.trunc(frame['cyc'] / frame['interval'] /
+                                            10000 / frame['util']), 0)
+        columns = [self.samples[source].tolist()
+                   for _, _, source in FleetFrame.COUNTERS] +\
+            [frame['interval'].tolist()] +\
+            [frame[field].tolist() for field, _ in FleetFrame.STORED]
+        keys = [key for _, key, _ in FleetFrame.COUNTERS] + ['interval'] +\
+            [key for _, key in FleetFrame.STORED]
+        for con, values in zip(self.containers, zip(*columns)):
+            metrics = con.metrics
+            metrics['time'] = timestamp
+            metrics.update(zip(keys, values))
+            metrics[Metric.NF] = int(metrics[Metric.NF])
+
+    def _gather(self, mask):
+        """
+        gather threshold limits of utilization bin and TDP thresholds of
+        masked rows, NaN if absent, result is kept for later passes
+        """
+        if self.limits is not None:
+            return self.limits
+        table = np.full((len(self), len(ThresholdTable.LIMITS)), np.nan)
+        tdp_table = np.full((len(self), 2), np.nan)
+        bins = [None] * len(self)
+        for i in np.flatnonzero(mask):
+            con = self.containers[i]
+            if con.thresh:
+                index = con.thresh.find(self.frame['util'][i])
+                if index >= 0:
+                    table[i] = con.thresh.rows[index]
+                    bins[i] = con.thresh[index]
+            if con.tdp_thresh:
+                tdp_table[i] = (con.tdp_thresh['util'],
+                                con.tdp_thresh['bar'])
+        self.limits = table, tdp_table, bins
+        return self.limits
+
+    def near_threshold(self, mask, margin):
+        """
+        return True if CPI or MPKI of any masked row is within margin of
+        its bin threshold
+            mask - boolean array selecting latency critical rows
+            margin - margin ratio related to threshold
+        """
+        table, _, _ = self._gather(mask)
+        frame = self.frame
+        with np.errstate(invalid='ignore'):
+            near = (frame['cpi'] >= table[:, 0] * (1 - margin)) |\
+                (frame['l3mpki'] >= table[:, 1] * (1 - margin))
+        return bool(near.any())
+
+    def _stat(self, stat):
+        """ return CPI, MPKI and memory bandwidth columns of statistic """
+        frame = self.frame
+        if stat == 'mean':
+            return frame['cpi'], frame['l3mpki'], frame['mbl'] + frame['mbr']
+        mb_value = frame[FleetFrame.MB_STATS[stat]]
+        return frame['cpi_' + stat], frame['mpki_' + stat], mb_value
+
+    def detect(self, mask, verbose=False, min_coverage=0.0, stat='mean'):
+        """
+        detect resource contention of masked rows against threshold bin of
+        their utilization and TDP threshold
+            mask - boolean array selecting latency critical rows
+            verbose - print TDP detection inputs
+            min_coverage - rows whose perf counters ran less than this ratio
+                           of their enabled time are not reported
+            stat - statistic of CPI, MPKI and memory bandwidth compared to
+                   thresholds, interval mean or sub-interval percentile, the
+                   low side percentile is used for memory bandwidth
+        return boolean contention matrix, one row per frame row and one
+        column per type in CONTENTIONS
+        """
+        frame = self.frame
+        table, tdp_table, bins = self._gather(mask)
+        matrix = np.zeros((len(self), len(CONTENTIONS)), dtype=bool)
+        with np.errstate(invalid='ignore'):
+            cpi_value, mpki_value, mb_value = self._stat(stat)
+            cpi = cpi_value > table[:, 0]
+            llc = cpi & (mpki_value > table[:, 1])
+            mbw = cpi & ((mb_value < table[:, 2]) |
+                         (frame['mspki'] > table[:, 3]))
+            matrix[:, 0] = llc
+            matrix[:, 1] = mbw
+            matrix[:, 2] = cpi & ~llc & ~mbw
+            matrix[:, 3] = (frame['util'] >= tdp_table[:, 0]) &\
+                (frame['nf'] < tdp_table[:, 1])
+        # counters extrapolated from a small PMU share are too noisy to act on
+        uncovered = matrix.any(axis=1) & (frame['coverage'] < min_coverage)
+        for i in np.flatnonzero(uncovered):
+            print('skip contention of container %s, PMU coverage %.2f' %
+                  (self.containers[i].name, frame['coverage'][i]))
+        matrix[uncovered] = False
+
+        if verbose:
+            for i in np.flatnonzero(~np.isnan(tdp_table[:, 0])):
+                print(frame['util'][i], frame['nf'][i], tdp_table[i, 0],
+                      tdp_table[i, 1])
+        for i in np.flatnonzero(matrix.any(axis=1)):
+            con = self.containers[i]
+            contends = [contention for contention, flag
+                        in zip(CONTENTIONS, matrix[i]) if flag]
+            if bins[i] is not None:
+                con.report_contention(bins[i], contends)
+            if matrix[i, 3]:
+                print('TDP Contention Alert!')
+        return matrix
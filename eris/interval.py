@@ -0,0 +1,75 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements adaptive platform metrics monitor interval """
+
+from __future__ import print_function
+
+from datetime import datetime
+
+
+class AdaptiveInterval(object):
+    """
+    This class adapts metrics monitor interval to node state, the interval
+    drops to minimum when LC workloads get close to their thresholds or a
+    controller acted, and doubles up to maximum after steady cycles
+    """
+    STEADY_CYCLES = 3
+
+    def __init__(self, min_interval, max_interval, interval,
+                 steady_cycles=STEADY_CYCLES):
+        """
+            min_interval - shortest interval in seconds
+            max_interval - longest interval in seconds
+            interval - initial interval in seconds
+            steady_cycles - steady cycles before interval is lengthened
+        """
+        if min_interval <= 0 or min_interval > max_interval:
+            raise ValueError('invalid interval bounds %s-%s' %
+                             (min_interval, max_interval))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = max(min_interval, min(interval, max_interval))
+        self.steady_cycles = steady_cycles
+        self.steady = 0
+        self.acted = False
+
+    def control_acted(self):
+        """ notify a controller changed resource allocation """
+        self.acted = True
+
+    def update(self, near):
+        """
+        update interval after one metrics cycle and return new interval
+            near - if any LC workload is close to its threshold
+        """
+        acted = self.acted
+        self.acted = False
+        interval = self.interval
+        if near or acted:
+            self.steady = 0
+            interval = self.min_interval
+        else:
+            self.steady += 1
+            if self.steady >= self.steady_cycles:
+                self.steady = 0
+                interval = min(interval * 2, self.max_interval)
+        if interval != self.interval:
+            print(datetime.now().isoformat(' ') +
+                  ' metrics monitor interval changed to ' + str(interval))
+            self.interval = interval
+        return interval
@@ -15,58 +15,84 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 
-""" This module implements last level cache control based on pqos tool """
+""" This module implements last level cache control based on resctrl """
 
 from __future__ import print_function
 
-import subprocess
 from datetime import datetime
 from mresource import Resource
+from resctrl import Resctrl, TaskTracker
 
 
 class LlcOccup(Resource):
-    """ This class is the resource class of LLC occupancy """
+    """
+    This class is the resource class of LLC occupancy, resource groups of
+    BE and LC classes of service are created on first use
+    """
+    BE_GROUP = 'COS1'
+    LC_GROUP = 'COS2'
 
-    def __init__(self, init_level, exclusive):
-        bitcnt = LlcOccup._get_cbm_bit_count()
-        self.be_bmp = [hex(((1 << (i + 1)) - 1) << (bitcnt - 1 - i))
+    def __init__(self, init_level, exclusive, root=Resctrl.ROOT):
+        self.resctrl = Resctrl(root)
+        self.tracker = TaskTracker(self.resctrl)
+        bitcnt = self.resctrl.get_cbm_bit_count()
+        self.be_bmp = [((1 << (i + 1)) - 1) << (bitcnt - 1 - i)
                        for i in range(1, bitcnt)]
-        self.lc_bmp = [hex((1 << (bitcnt - 1 - i)) - 1)
+        self.lc_bmp = [(1 << (bitcnt - 1 - i)) - 1
                        for i in range(1, bitcnt)]
         if exclusive:
             self.be_bmp = self.be_bmp[0:int(bitcnt / 2)]
             self.lc_bmp = self.lc_bmp[0:int(bitcnt / 2)]
+        self.groups = None
         super(LlcOccup, self).__init__(init_level, int(bitcnt / 2) if
                                        exclusive else bitcnt - 1)
 
-    @staticmethod
-    def _get_cbm_bit_count():
-        with open('/sys/fs/resctrl/info/L3/cbm_mask') as cbmf:
-            cbm_mask = cbmf.readline()
-            cbm = int(cbm_mask, 16)
-            cbm_bin = bin(cbm)
-            setbits = [bit for bit in cbm_bin[2:] if bit == '1']
-            return len(setbits)
-
-    def _budgeting(self, containers, clsid, is_be):
-        cpids = []
-        cns = []
-        for con in containers:
-            cpids.append(','.join(con.pids))
-            cns.append(con.name)
+    def _get_groups(self):
+        """ return BE and LC resource group paths, created on first call """
+        if self.groups is None:
+            self.groups = (self.resctrl.create_group(LlcOccup.BE_GROUP),
+                           self.resctrl.create_group(LlcOccup.LC_GROUP))
+        return self.groups
 
+    def _budgeting(self, containers, is_be):
         bmp = self.be_bmp if is_be else self.lc_bmp
-        cml = 'pqos -I -a' + '\'pid:' + clsid + '=' + ','.join(cpids) + '\''
-        subprocess.Popen(cml, shell=True)
-
-        cml = 'pqos -e' + '\'llc:' + clsid + '=' + bmp[self.quota_level] + '\''
-        subprocess.Popen(cml, shell=True)
+        cns = [con.name for con in containers]
+        try:
+            be_group, lc_group = self._get_groups()
+            group = be_group if is_be else lc_group
+            self.resctrl.set_l3_mask(group, bmp[self.quota_level])
+            for con in containers:
+                self.tracker.assign(group, con)
+        except (IOError, OSError) as e:
+            print(datetime.now().isoformat(' ') + ' error in set container ' +
+                  ','.join(cns) + ' llc occupancy: ' + str(e))
+            return
 
         print(datetime.now().isoformat(' ') + ' set container ' +
-              ','.join(cns) + ' llc occupancy to ' + bmp[self.quota_level])
+              ','.join(cns) + ' llc occupancy to ' +
+              hex(bmp[self.quota_level]))
 
     def budgeting(self, bes, lcs):
         if bes:
-            self._budgeting(bes, '1', True)
+            self._budgeting(bes, True)
         if lcs:
-            self._budgeting(lcs, '2', False)
+            self._budgeting(lcs, False)
+
+    def update_tasks(self, bes, lcs):
+        """
+        Move threads spawned since last update into class of service of
+        their containers, containers not given are no longer tracked
+            bes - BE containers in BE class of service
+            lcs - LC containers in LC class of service
+        """
+        try:
+            if bes or lcs:
+                be_group, lc_group = self._get_groups()
+            for con in bes:
+                self.tracker.assign(be_group, con)
+            for con in lcs:
+                self.tracker.assign(lc_group, con)
+        except (IOError, OSError) as e:
+            print(datetime.now().isoformat(' ') +
+                  ' error in update llc class of service tasks: ' + str(e))
+        self.tracker.retain({con.cid for con in bes + lcs})
@@ -36,6 +36,7 @@ class NaiveController:
             be_containers - all BE workload containers
             detected - if resource contention detected on LC workloads
             hold - if current resource level need to be maintained
+        return True if resource budget of BE workloads is changed
         """
 
         if detected:
@@ -47,6 +48,7 @@ class NaiveController:
                 # always throttle BE to minimal
                 self.res.set_level(Resource.BUGET_LEV_MIN)
                 self.res.budgeting(be_containers, lc_containers)
+                return True
         else:
             if hold or self.res.is_full_level():
                 # no contention, pass
@@ -58,3 +60,5 @@ class NaiveController:
                     self.cyc_cnt = 0
                     self.res.increase_level()
                     self.res.budgeting(be_containers, lc_containers)
+                    return True
+        return False
@@ -20,9 +20,10 @@ interface"""
 import sys
 import traceback
 
-from ctypes import cdll, Structure
+import numpy as np
+
+from ctypes import cdll, Structure, byref, sizeof
 from ctypes import c_char_p, c_ulonglong, c_double, c_int, POINTER
-from analyze.analyzer import Metric
 
 
 class cgroup(Structure):
@@ -36,30 +37,80 @@ class cgroup(Structure):
                 ("stalls_memory_load", c_ulonglong),
                 ("llc_occupancy", c_ulonglong),
                 ("mbm_local", c_double),
-                ("mbm_remote", c_double)]
+                ("mbm_remote", c_double),
+                ("interval", c_ulonglong),
+                ("cpu_count", c_int),
+                ("cpus", POINTER(c_int)),
+                ("coverage", c_double),
+                ("cpi_p50", c_double),
+                ("cpi_p95", c_double),
+                ("cpi_max", c_double),
+                ("mpki_p50", c_double),
+                ("mpki_p95", c_double),
+                ("mpki_max", c_double),
+                ("mb_p50", c_double),
+                ("mb_p5", c_double),
+                ("mb_min", c_double)]
+
+
+# numpy view of result fields of cgroup struct array, laid over ctypes memory
+SAMPLE_FIELDS = [("ret", np.int32),
+                 ("instructions", np.uint64),
+                 ("cycles", np.uint64),
+                 ("llc_misses", np.uint64),
+                 ("stalls_l2_misses", np.uint64),
+                 ("stalls_memory_load", np.uint64),
+                 ("llc_occupancy", np.uint64),
+                 ("mbm_local", np.float64),
+                 ("mbm_remote", np.float64),
+                 ("interval", np.uint64),
+                 ("coverage", np.float64),
+                 ("cpi_p50", np.float64),
+                 ("cpi_p95", np.float64),
+                 ("cpi_max", np.float64),
+                 ("mpki_p50", np.float64),
+                 ("mpki_p95", np.float64),
+                 ("mpki_max", np.float64),
+                 ("mb_p50", np.float64),
+                 ("mb_p5", np.float64),
+                 ("mb_min", np.float64)]
+SAMPLE_DTYPE = np.dtype({
+    'names': [name for name, _ in SAMPLE_FIELDS],
+    'formats': [fmt for _, fmt in SAMPLE_FIELDS],
+    'offsets': [getattr(cgroup, name).offset for name, _ in SAMPLE_FIELDS],
+    'itemsize': sizeof(cgroup),
+})
 
 
 class context(Structure):
     _fields_ = [("ret", c_int),
                 ("core", c_int),
-                ("period", c_int),
                 ("cgroup_count", c_int),
                 ("timestamp", c_ulonglong),
                 ("cgroups", POINTER(cgroup))]
 
 
 class Pgos(object):
-    """ This class wraps libpgos interface and provide eris friendly method """
+    """
+    This class wraps libpgos interface and provide eris friendly method. The
+    libpgos session keeps perf counters and pqos monitoring groups of every
+    collected cgroup open, so each collect returns the deltas since the
+    previous one instead of blocking for a whole sampling period.
+    """
 
-    def __init__(self, num_core, period):
+    def __init__(self, num_core):
         lib = cdll.LoadLibrary('./libpgos.so')
-        lib.collect.argtypes = [context]
-        lib.collect.restype = context
+        lib.collect.argtypes = [POINTER(context)]
+        lib.collect.restype = c_int
+        lib.pgos_sample.restype = None
         self.lib = lib
         ctx = context()
         ctx.core = num_core
-        ctx.period = period
         self.ctx = ctx
+        self.cgps = None
+        self.cids = []
+        self.cg_array = None
+        self.view = np.empty(0, dtype=SAMPLE_DTYPE)
 
     def init_pgos(self):
         return self.lib.pgos_init()
@@ -67,41 +118,89 @@ class Pgos(object):
     def fin_pgos(self):
         self.lib.pgos_finalize()
 
-    def collect(self, cgps):
-        ctx = self.ctx
-        ctx.cgroup_count = len(cgps)
-        cg_array = []
-        for cgp in cgps:
-            cg = cgroup()
+    def close_session(self):
+        """ close all counters and monitoring groups kept by libpgos """
+        self.lib.pgos_close_session()
+
+    def sample(self):
+        """
+        read running counters of all cgroups of the session as one
+        sub-interval, p50/p95/max of sub-intervals are reported by collect
+        """
+        self.lib.pgos_sample()
+
+    def _prepare(self, cgps):
+        """
+        build cgroup struct array passed to libpgos, the array and its numpy
+        view are kept and reused until the given cgroups change
+        """
+        if cgps == self.cgps:
+            return
+        cg_array = (cgroup * len(cgps))()
+        for cg, cgp in zip(cg_array, cgps):
             cg.cid = cgp[0].encode()
             cg.path = cgp[1].encode()
-            cg_array.append(cg)
-        ctx.cgroups = (cgroup * len(cgps))(* cg_array)
-        metrics = []
+            if cgp[2]:
+                cg.cpu_count = len(cgp[2])
+                cg.cpus = (c_int * len(cgp[2]))(*cgp[2])
+        self.ctx.cgroup_count = len(cgps)
+        self.ctx.cgroups = cg_array
+        self.cg_array = cg_array
+        self.cgps = list(cgps)
+        self.cids = [cgp[0] for cgp in cgps]
+        if cgps:
+            self.view = np.frombuffer(cg_array, dtype=SAMPLE_DTYPE)
+        else:
+            self.view = np.empty(0, dtype=SAMPLE_DTYPE)
+
+    def collect_raw(self, cgps):
+        """
+        collect metrics deltas of given cgroups since previous collect into
+        view, which then holds one row per given cgroup
+            cgps - list of (container id, perf_event cgroup path, cpu list)
+                   tuples
+        return libpgos error code, None on failure to call libpgos, and
+        timestamp in nanoseconds
+        """
+        self._prepare(cgps)
+        ret = None
         try:
-            res = self.lib.collect(ctx)
+            ret = self.lib.collect(byref(self.ctx))
         except Exception:
             traceback.print_exc(file=sys.stdout)
-        if res.ret == 0:
-            for i in range(len(cgps)):
-                cg = res.cgroups[i]
-                if cg.ret != 0:
-                    print('error in metrics collect for container: ' +
-                          cg.cid.decode('utf-8') +
-                          ', error code: ' + str(cg.ret))
-                    continue
-                metrics.append((cg.cid.decode('utf-8'),
-                                {
-                                    Metric.INST: cg.instructions,
-                                    Metric.CYC: cg.cycles,
-                                    Metric.L3MISS: cg.llc_misses,
-                                    Metric.L2STALL: cg.stalls_l2_misses,
-                                    Metric.MEMSTALL: cg.stalls_memory_load,
-                                    Metric.L3OCC: cg.llc_occupancy,
-                                    Metric.MBL: cg.mbm_local,
-                                    Metric.MBR: cg.mbm_remote,
-                                }))
-        else:
-            print('error in libpgos collect, error code:' + str(res.ret))
+        return ret, self.ctx.timestamp
+
+    def collect(self, cgps):
+        """
+        collect metrics deltas of given cgroups since previous collect
+            cgps - list of (container id, perf_event cgroup path, cpu list)
+                   tuples, counters of a cgroup with empty cpu list are
+                   opened on all cores
+        return timestamp in nanoseconds, list of container ids and samples
+        of those containers as structured array of SAMPLE_DTYPE, cgroups
+        newly added to the session are not reported until the next collect
+        """
+        ret, timestamp = self.collect_raw(cgps)
+        if ret is None:
+            return 0, [], self.view[:0].copy()
+        if ret != 0:
+            print('error in libpgos collect, error code:' + str(ret))
+            return timestamp, [], self.view[:0].copy()
+        cids, samples = select_samples(self.cids, self.view)
+        return timestamp, cids, samples
+
 
-        return res.timestamp, metrics
+def select_samples(cids, view):
+    """
+    select samples of cgroups collected without error and not newly added,
+    errors are reported
+        cids - container ids of view rows
+        view - pgos samples, one row per collected cgroup
+    return list of container ids and copy of their samples
+    """
+    for i in np.flatnonzero(view['ret'] != 0):
+        print('error in metrics collect for container: ' +
+              cids[i] + ', error code: ' + str(view['ret'][i]))
+    rows = np.flatnonzero((view['ret'] == 0) & (view['interval'] != 0))
+    # samples are copied out as the view is overwritten by next collect
+    return [cids[i] for i in rows], view[rows]
@@ -17,63 +17,120 @@
 
 """ This module start a prometheus client and expose collected metrics """
 
-from prometheus_client import Gauge, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
 
+from analyze.metric import Metric
+
+
+class SnapshotCollector(object):
+    """
+    This class renders container gauges from the latest metrics snapshot on
+    each scrape, containers absent from the snapshot have no series
+    """
+    FAMILIES = [
+        ('cma_cpu_usage_percentage', 'CPU usage percentage of a container'),
+        ('cma_unhalted_cycles', 'Unhalted cycles of a container'),
+        ('cma_llc_misses', 'LLC misses of a container'),
+        ('cma_instructions', 'Instructions of a container'),
+        ('cma_cycles_per_instruction',
+         'Cycles per instruction of a container'),
+        ('cma_misses_per_instruction',
+         'Misses per instruction of a container'),
+        ('cma_stalls_mem_per_instruction',
+         'Stalls memory load per instruction of a container'),
+        ('cma_average_frequency', 'Average frequency of a container'),
+        ('cma_memory_bandwidth', 'Memory bandwidth of a container'),
+        ('cma_llc_occupancy', 'LLC occupancy of a container'),
+        ('cma_pmu_coverage',
+         'Running to enabled time ratio of perf counters of a container'),
+    ]
 
-class PrometheusClient:
     def __init__(self):
-        self.gauge_cpu_usage_percentage = Gauge('cma_cpu_usage_percentage',
-                                                'CPU usage percentage of a\
-                                                container', ['container'])
-        self.gauge_llc_misses = Gauge('cma_llc_misses',
-                                      'CPU usage percentage of a container',
-                                      ['container'])
-        self.gauge_unhalted_cycles = Gauge('cma_unhalted_cycles',
-                                           'CPU usage percentage of a\
-                                           container', ['container'])
-        self.gauge_instructions = Gauge('cma_instructions',
-                                        'Instructions of a container',
-                                        ['container'])
-        self.gauge_cycles_per_instruction = Gauge('cma_cycles_per_instruction',
-                                                  'Cycles per instruction of a\
-                                                  container', ['container'])
-        self.gauge_misses_per_instruction = Gauge('cma_misses_per_instruction',
-                                                  'Misses per instruction of a\
-                                                  container', ['container'])
-        self.gauge_stalls_mem_per_instruction = Gauge(
-            'cma_stalls_mem_per_instruction',
-            'Stalls memory load per instruction of a container', ['container'])
-        self.gauge_average_frequency = Gauge('cma_average_frequency',
-                                             'Instructions of a container',
-                                             ['container'])
-        self.gauge_memory_bandwidth = Gauge('cma_memory_bandwidth',
-                                            'Instructions of a container',
-                                            ['container'])
-        self.gauge_llc_occupancy = Gauge('cma_llc_occupancy',
-                                         'Instructions of a container',
-                                         ['container'])
+        self.snapshot = []
+
+    def _families(self):
+        return [GaugeMetricFamily(name, doc, labels=['container'])
+                for name, doc in SnapshotCollector.FAMILIES]
+
+    def describe(self):
+        return self._families()
+
+    def collect(self):
+        families = self._families()
+        for container_name, values in self.snapshot:
+            for family, value in zip(families, values):
+                family.add_metric([container_name], value)
+        return families
+
+
+class PrometheusClient(object):
+    def __init__(self, addr='', port=8080):
+        """
+            addr - address the metrics endpoint binds to, all if empty
+            port - port the metrics endpoint listens on
+        """
+        self.addr = addr
+        self.port = port
+        self.snapshot_collector = SnapshotCollector()
+        REGISTRY.register(self.snapshot_collector)
+        self.histogram_phase_duration = Histogram(
+            'eris_phase_duration_seconds',
+            'Duration of one phase of eris monitor loops', ['phase'],
+            buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5,
+                     1, 2.5, 5, 10))
+        self.counter_late_ticks = Counter(
+            'eris_late_ticks', 'Ticks of eris timer loop which overran its\
+            interval', ['loop'])
+        self.counter_skipped_ticks = Counter(
+            'eris_skipped_ticks', 'Intervals skipped by eris timer loop due\
+            to overrun', ['loop'])
+        self.gauge_model_version = Gauge(
+            'eris_threshold_model_version', 'Threshold model version in use\
+            by eris, value is always 1', ['version'])
+        self.model_version = None
+        self.gauge_metric_interval = Gauge(
+            'eris_metric_interval_seconds', 'Current platform metrics\
+            monitor interval of eris')
 
     def start(self):
-        start_http_server(8080)
-
-    def send_metrics(self, container_name, cpu_usage_percentage,
-                     unhalted_cycle, llc_miss, instructions,
-                     cycles_per_instruction, misses_per_instruction,
-                     stalls_mem_load_per_instruction, average_frequency,
-                     memory_bandwidth, llc_occupancy):
-        self.gauge_cpu_usage_percentage.labels(container_name).set(
-            cpu_usage_percentage)
-        self.gauge_unhalted_cycles.labels(container_name).set(unhalted_cycle)
-        self.gauge_llc_misses.labels(container_name).set(llc_miss)
-        self.gauge_instructions.labels(container_name).set(instructions)
-        self.gauge_cycles_per_instruction.labels(container_name).set(
-            cycles_per_instruction)
-        self.gauge_misses_per_instruction.labels(container_name).set(
-            misses_per_instruction)
-        self.gauge_stalls_mem_per_instruction.labels(container_name).set(
-            stalls_mem_load_per_instruction)
-        self.gauge_average_frequency.labels(container_name).set(
-            average_frequency)
-        self.gauge_memory_bandwidth.labels(container_name).set(
-            memory_bandwidth)
-        self.gauge_llc_occupancy.labels(container_name).set(llc_occupancy)
+        start_http_server(self.port, self.addr)
+
+    def observe_phase(self, phase, seconds):
+        self.histogram_phase_duration.labels(phase).observe(seconds)
+
+    def inc_late_ticks(self, loop, skipped):
+        self.counter_late_ticks.labels(loop).inc()
+        self.counter_skipped_ticks.labels(loop).inc(skipped)
+
+    def set_model_version(self, version):
+        """
+        expose version of loaded threshold model, the new series is set
+        before the stale one is removed so scrapes always see one
+            version - threshold model version
+        """
+        self.gauge_model_version.labels(version).set(1)
+        if self.model_version is not None and self.model_version != version:
+            self.gauge_model_version.remove(self.model_version)
+        self.model_version = version
+
+    def set_metric_interval(self, interval):
+        self.gauge_metric_interval.set(interval)
+
+    def update_snapshot(self, full_metrics):
+        """
+        replace metrics snapshot exposed to Prometheus with one cycle
+            full_metrics - list of (container, full metrics of container)
+                           tuples of all containers in this cycle
+        """
+        snapshot = []
+        for con, metrics in full_metrics:
+            snapshot.append((con.name, (
+                metrics[Metric.UTIL], metrics[Metric.CYC],
+                metrics[Metric.L3MISS], metrics[Metric.INST],
+                metrics[Metric.CPI], metrics[Metric.L3MPKI],
+                metrics[Metric.MSPKI], metrics[Metric.NF],
+                metrics[Metric.MBR] + metrics[Metric.MBL],
+                metrics[Metric.L3OCC], metrics[Metric.COVERAGE])))
+        # rebinding is atomic, scrapes see either the old or the new cycle
+        self.snapshot_collector.snapshot = snapshot
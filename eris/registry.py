@@ -0,0 +1,256 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements running container registry fed by Docker events """
+
+from __future__ import print_function
+
+import sys
+import traceback
+
+from threading import Event, Lock, Thread
+
+from docker.errors import NotFound
+from container import cgroup_paths
+from tasks import TaskResolver
+
+
+class ContainerEntry(object):
+    """ This class caches identity and cgroup paths of a running container """
+
+    def __init__(self, container, cgroup_driver, key_cid):
+        self.container = container
+        self.cid = container.id
+        self.name = container.name
+        self.key = self.cid if key_cid else self.name
+        self.parent_path, self.con_path = cgroup_paths(cgroup_driver,
+                                                       self.cid)
+        self.perf_path = '/sys/fs/cgroup/perf_event/' + self.parent_path +\
+            self.con_path
+        self.cpu_path = '/sys/fs/cgroup/cpu/' + self.parent_path +\
+            self.con_path
+        self.tasks = TaskResolver(self.cpu_path)
+
+
+class ContainerRegistry(object):
+    """
+    This class keeps running containers up to date from Docker events stream,
+    a periodic reconcile against container list recovers missed events.
+    Every container changed by an event is stamped with a sequence number,
+    and reconcile leaves containers changed after its list started to events
+    """
+    RECONCILE_INTERVAL = 60
+    EVENTS = ['start', 'die', 'rename']
+
+    def __init__(self, client, cgroup_driver, key_cid,
+                 reconcile_interval=RECONCILE_INTERVAL):
+        self.client = client
+        self.cgroup_driver = cgroup_driver
+        self.key_cid = key_cid
+        self.reconcile_interval = reconcile_interval
+        self.generation = 0
+        self._entries = dict()
+        self._seq = 0
+        self._changed = dict()
+        self._lock = Lock()
+        self._reconcile_lock = Lock()
+        self.shutdown = Event()
+
+    def start(self):
+        """ load running containers and start following Docker events """
+        self.reconcile()
+        for target in (self._watch_events, self._reconcile_loop):
+            thread = Thread(target=target)
+            thread.daemon = True
+            thread.start()
+
+    def stop(self):
+        """ stop following Docker events """
+        self.shutdown.set()
+
+    def entries(self):
+        """ return list of running container entries """
+        with self._lock:
+            return list(self._entries.values())
+
+    def cids(self):
+        """ return set of running container ids """
+        with self._lock:
+            return set(self._entries)
+
+    def _mark(self, cid):
+        """ stamp container changed by event, lock is held by caller """
+        self._seq += 1
+        self._changed[cid] = self._seq
+
+    def _put(self, entry):
+        """ store container entry, lock is held by caller """
+        known = self._entries.get(entry.cid)
+        if known is not None:
+            entry.tasks = known.tasks
+        self._entries[entry.cid] = entry
+        self.generation += 1
+
+    def _add(self, container):
+        entry = ContainerEntry(container, self.cgroup_driver, self.key_cid)
+        with self._lock:
+            self._mark(entry.cid)
+            self._put(entry)
+
+    def _remove(self, cid):
+        with self._lock:
+            self._mark(cid)
+            if self._entries.pop(cid, None) is not None:
+                self.generation += 1
+
+    def reconcile(self):
+        """ synchronize registry with container list from Docker """
+        with self._reconcile_lock:
+            with self._lock:
+                started = self._seq
+                known = set(self._entries)
+            containers = self.client.containers.list()
+            cids = {c.id for c in containers}
+            entries = [ContainerEntry(c, self.cgroup_driver, self.key_cid)
+                       for c in containers if c.id not in known]
+            with self._lock:
+                # events seen since list started are newer than the list
+                fresh = {cid for cid, seq in self._changed.items()
+                         if seq > started}
+                for entry in entries:
+                    if entry.cid not in self._entries and\
+                       entry.cid not in fresh:
+                        self._put(entry)
+                for cid in set(self._entries) - cids - fresh:
+                    del self._entries[cid]
+                    self.generation += 1
+                self._changed = {cid: self._changed[cid] for cid in fresh}
+
+    def _handle_event(self, event):
+        cid = event['Actor']['ID']
+        if event['Action'] == 'die':
+            self._remove(cid)
+            return
+        try:
+            self._add(self.client.containers.get(cid))
+        except NotFound:
+            self._remove(cid)
+
+    def _watch_events(self):
+        while not self.shutdown.is_set():
+            try:
+                events = self.client.events(
+                    decode=True, filters={'type': 'container',
+                                          'event': ContainerRegistry.EVENTS})
+                self.reconcile()
+                for event in events:
+                    if self.shutdown.is_set():
+                        break
+                    try:
+                        self._handle_event(event)
+                    except Exception:
+                        traceback.print_exc(file=sys.stdout)
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
+                self.shutdown.wait(self.reconcile_interval)
+
+    def _reconcile_loop(self):
+        while not self.shutdown.wait(self.reconcile_interval):
+            try:
+                self.reconcile()
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
+
+
+class ContainerTable(object):
+    """
+    This class holds the single Container object of each running container
+    shared by util and metric monitor loops. Each loop synchronizes with
+    registry on its own and is told which containers it has not seen yet
+    and which ones it has seen are gone. A container renamed in Docker keeps
+    its Container object, which is passed to rename with its new entry
+    """
+
+    def __init__(self, registry, factory, rename=None):
+        """
+            registry - running container registry
+            factory - function creating Container from registry entry
+            rename - function updating Container from entry of renamed
+                     container
+        """
+        self.registry = registry
+        self.factory = factory
+        self.rename = rename
+        self.generation = None
+        self._containers = dict()
+        self._seen = dict()
+        self._lock = Lock()
+
+    def sync(self, loop):
+        """
+        synchronize containers with registry on behalf of one monitor loop
+            loop - monitor loop name
+        return tuple of running registry entries, their containers in the
+        same order, set of containers new to the loop and set of ids of
+        containers gone since the loop synchronized last
+        """
+        generation = self.registry.generation
+        entries = self.registry.entries()
+        with self._lock:
+            containers = self._containers
+            if generation != self.generation:
+                cids = {entry.cid for entry in entries}
+                for cid in [cid for cid in containers if cid not in cids]:
+                    del containers[cid]
+                self.generation = generation
+            seen = self._seen.setdefault(loop, set())
+            cons = []
+            added = set()
+            for entry in entries:
+                con = containers.get(entry.cid)
+                if con is None:
+                    con = containers[entry.cid] = self.factory(entry)
+                elif con.name != entry.name and self.rename:
+                    self.rename(con, entry)
+                if entry.cid not in seen:
+                    added.add(con)
+                cons.append(con)
+            removed = seen - {con.cid for con in cons}
+            self._seen[loop] = {con.cid for con in cons}
+        return entries, cons, added, removed
+
+    def get(self, cid):
+        """ return container of container id, None if not running """
+        with self._lock:
+            return self._containers.get(cid)
+
+    def values(self, loop=None):
+        """
+        return list of running containers
+            loop - only containers seen by this monitor loop if given
+        """
+        with self._lock:
+            if loop is None:
+                return list(self._containers.values())
+            seen = self._seen.get(loop, ())
+            return [con for cid, con in self._containers.items()
+                    if cid in seen]
+
+    def items(self):
+        """ return list of (container id, container) of running containers """
+        with self._lock:
+            return list(self._containers.items())
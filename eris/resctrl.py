@@ -0,0 +1,133 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements cache allocation control on resctrl filesystem """
+
+import errno
+import os
+
+from os.path import join as path_join
+
+
+class Resctrl(object):
+    """
+    This class manages resource groups under resctrl filesystem, all methods
+    write resctrl files directly and raise IOError/OSError on failure
+    """
+    ROOT = '/sys/fs/resctrl'
+
+    def __init__(self, root=ROOT):
+        self.root = root
+        self.cache_ids = self._get_cache_ids()
+
+    def _get_cache_ids(self):
+        with open(path_join(self.root, 'schemata')) as schemataf:
+            for line in schemataf:
+                resource, _, domains = line.strip().partition(':')
+                if resource == 'L3':
+                    return [domain.split('=')[0]
+                            for domain in domains.split(';')]
+        return []
+
+    def get_cbm_bit_count(self):
+        """ return bit count of L3 cache capacity bitmask """
+        with open(path_join(self.root, 'info', 'L3', 'cbm_mask')) as cbmf:
+            cbm = int(cbmf.readline(), 16)
+            return bin(cbm).count('1')
+
+    def create_group(self, name):
+        """
+        create resource group if not exists and return its path
+            name - resource group name
+        """
+        path = path_join(self.root, name)
+        try:
+            os.mkdir(path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        return path
+
+    def set_l3_mask(self, group, mask):
+        """
+        set L3 capacity bitmask of resource group on all cache domains
+            group - resource group path
+            mask - capacity bitmask
+        """
+        schemata = 'L3:' + ';'.join('%s=%x' % (cache_id, mask)
+                                    for cache_id in self.cache_ids) + '\n'
+        with open(path_join(group, 'schemata'), 'w') as schemataf:
+            schemataf.write(schemata)
+
+    @staticmethod
+    def assign_tasks(group, tids):
+        """
+        move tasks into resource group, tasks exited meanwhile are skipped
+            group - resource group path
+            tids - thread id list
+        """
+        fd = os.open(path_join(group, 'tasks'), os.O_WRONLY)
+        try:
+            for tid in tids:
+                try:
+                    os.write(fd, str(tid).encode())
+                except OSError as e:
+                    if e.errno != errno.ESRCH:
+                        raise
+        finally:
+            os.close(fd)
+
+
+class TaskTracker(object):
+    """
+    This class remembers the resource group and threads of each container
+    at its last assignment. A container whose thread list generation did not
+    change is skipped, otherwise its thread list is diffed against the last
+    one and only threads not yet written to the group are moved into it
+    """
+
+    def __init__(self, resctrl):
+        self.resctrl = resctrl
+        self.containers = dict()
+
+    def assign(self, group, container):
+        """
+        move threads of container into resource group
+            group - resource group path
+            container - container to be moved
+        """
+        state = self.containers.get(container.cid)
+        if state is not None and state[0] == group and\
+           state[1] == container.pids_generation:
+            return
+        tids = set(container.pids)
+        if state is not None and state[0] == group:
+            new = tids - state[2]
+        else:
+            new = tids
+        if new:
+            self.resctrl.assign_tasks(group, new)
+        self.containers[container.cid] = (group, container.pids_generation,
+                                          tids)
+
+    def retain(self, cids):
+        """
+        forget containers not in given container ids
+            cids - container ids still tracked
+        """
+        for cid in [cid for cid in self.containers if cid not in cids]:
+            del self.containers[cid]
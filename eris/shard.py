@@ -0,0 +1,228 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module implements sharded platform metrics collection, cgroups are
+partitioned across worker processes each running its own libpgos session,
+and collected samples are merged over shared memory
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import signal
+import zlib
+
+import numpy as np
+
+from pgos import Pgos, SAMPLE_DTYPE, select_samples
+
+
+def _work(conn, num_core, buf):
+    """
+    worker process loop, run commands of coordinator on own libpgos session
+    and write collected rows to shared buffer
+        conn - pipe connection to coordinator
+        num_core - number of cores of host
+        buf - shared buffer of SAMPLE_DTYPE rows
+    """
+    # interrupt goes to coordinator, which stops workers in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    pgos = Pgos(num_core)
+    conn.send(pgos.init_pgos())
+    out = np.frombuffer(buf, dtype=SAMPLE_DTYPE)
+    cgps = []
+    while True:
+        cmd, arg = conn.recv()
+        if cmd == 'collect':
+            if arg is not None:
+                cgps = arg
+            ret, timestamp = pgos.collect_raw(cgps)
+            if ret == 0:
+                out[:len(cgps)] = pgos.view
+            conn.send((ret, timestamp))
+        elif cmd == 'sample':
+            pgos.sample()
+        elif cmd == 'close':
+            pgos.close_session()
+        elif cmd == 'stop':
+            pgos.fin_pgos()
+            return
+
+
+class ShardedPgos(object):
+    """
+    This class provides Pgos interface over worker processes, containers are
+    assigned to a worker by hash of container id, which keeps counters of a
+    container open in the same worker across cycles. Collect runs in all
+    workers in parallel, each worker writes its rows to a shared buffer of
+    fixed capacity and the coordinator merges them, so detection and control
+    run once on the merged samples. Workers are spawned, not forked, as the
+    agent already runs threads when collection starts, and a worker which
+    died is restarted with an empty session
+    """
+    SHARD_CAPACITY = 512
+
+    def __init__(self, num_core, shards, capacity=SHARD_CAPACITY):
+        """
+            num_core - number of cores of host
+            shards - number of worker processes
+            capacity - maximal number of cgroups collected by one worker
+        """
+        self.num_core = num_core
+        self.capacity = capacity
+        self.mp = multiprocessing.get_context('spawn')
+        self.buffers = [self.mp.RawArray('b',
+                                         capacity * SAMPLE_DTYPE.itemsize)
+                        for _ in range(shards)]
+        self.views = [np.frombuffer(buf, dtype=SAMPLE_DTYPE)
+                      for buf in self.buffers]
+        self.conns = [None] * shards
+        self.workers = [None] * shards
+        self.cgps = None
+        self.shard_cgps = [[] for _ in range(shards)]
+
+    def _start_worker(self, i):
+        conn, child = self.mp.Pipe()
+        worker = self.mp.Process(target=_work,
+                                 args=(child, self.num_core, self.buffers[i]))
+        worker.daemon = True
+        worker.start()
+        child.close()
+        self.conns[i] = conn
+        self.workers[i] = worker
+
+    def _restart_worker(self, i):
+        """
+        replace dead worker of shard, its cgroups are sent again with next
+        collect and reported from the collect after
+        """
+        print('metrics worker of shard %d exited, restarting' % i)
+        self.conns[i].close()
+        self.workers[i].join(1)
+        self._start_worker(i)
+        self.cgps = None
+        self.shard_cgps[i] = []
+        try:
+            code = self.conns[i].recv()
+        except (EOFError, IOError, OSError):
+            print('metrics worker of shard %d failed to start' % i)
+            return
+        if code != 0:
+            print('error in libpgos init of shard %d, error code: %d' %
+                  (i, code))
+
+    def init_pgos(self):
+        """
+        start worker processes, which load and initialize libpgos
+        return libpgos init error codes of all workers or-ed together, -1
+        if a worker failed to start
+        """
+        for i in range(len(self.workers)):
+            self._start_worker(i)
+        code = 0
+        for i, conn in enumerate(self.conns):
+            try:
+                code |= conn.recv()
+            except (EOFError, IOError, OSError):
+                print('metrics worker of shard %d failed to start' % i)
+                code = -1
+        return code
+
+    def fin_pgos(self):
+        self._send('stop')
+        for worker in self.workers:
+            worker.join()
+
+    def close_session(self):
+        """ close all counters and monitoring groups kept by workers """
+        self._send('close')
+
+    def sample(self):
+        """ take one sub-sample of all cgroups in all workers """
+        self._send('sample')
+
+    def _send(self, cmd, args=None):
+        """ send command to all workers, return shards whose worker died """
+        dead = set()
+        for i, conn in enumerate(self.conns):
+            try:
+                conn.send((cmd, args[i] if args else None))
+            except (IOError, OSError):
+                dead.add(i)
+        if cmd != 'stop':
+            for i in dead:
+                self._restart_worker(i)
+        return dead
+
+    def _partition(self, cgps):
+        """
+        assign cgroups to shards
+        return cgroups of each shard, None for shards unchanged since
+        previous collect
+        """
+        if cgps == self.cgps:
+            return [None] * len(self.conns)
+        shards = [[] for _ in self.conns]
+        for cgp in cgps:
+            shards[zlib.crc32(cgp[0].encode()) % len(shards)].append(cgp)
+        for shard in shards:
+            if len(shard) > self.capacity:
+                print('shard capacity %d exceeded, %d containers are not '
+                      'collected' % (self.capacity,
+                                     len(shard) - self.capacity))
+                del shard[self.capacity:]
+        changed = [shard if shard != last else None
+                   for shard, last in zip(shards, self.shard_cgps)]
+        self.cgps = list(cgps)
+        self.shard_cgps = shards
+        return changed
+
+    def collect(self, cgps):
+        """
+        collect metrics deltas of given cgroups in all workers
+            cgps - list of (container id, perf_event cgroup path, cpu list)
+                   tuples
+        return latest worker timestamp in nanoseconds, list of container ids
+        and samples of those containers merged from all workers
+        """
+        dead = self._send('collect', self._partition(cgps))
+        timestamp = 0
+        cids = []
+        parts = []
+        shards = zip(self.conns, self.shard_cgps, self.views)
+        for i, (conn, shard, view) in enumerate(shards):
+            if i in dead:
+                continue
+            try:
+                ret, shard_timestamp = conn.recv()
+            except (EOFError, IOError, OSError):
+                self._restart_worker(i)
+                continue
+            if ret is None:
+                continue
+            if ret != 0:
+                print('error in libpgos collect, error code:' + str(ret))
+                continue
+            timestamp = max(timestamp, shard_timestamp)
+            shard_cids, samples = select_samples([cgp[0] for cgp in shard],
+                                                 view[:len(shard)])
+            cids.extend(shard_cids)
+            parts.append(samples)
+        if not parts:
+            return timestamp, [], np.empty(0, dtype=SAMPLE_DTYPE)
+        return timestamp, cids, np.concatenate(parts)
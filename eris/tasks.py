@@ -0,0 +1,52 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module resolves container thread ids from cgroup filesystem """
+
+from __future__ import print_function
+
+from os.path import join as path_join
+from threading import Lock
+
+
+class TaskResolver(object):
+    """
+    This class reads thread ids of one container from its cgroup tasks file
+    in a single read. The thread id list is cached and only replaced, with
+    generation increased, when the thread set actually changes
+    """
+
+    def __init__(self, cgroup_path):
+        self.path = path_join(cgroup_path, 'tasks')
+        self.generation = 0
+        self.tids = []
+        self._raw = None
+        self._lock = Lock()
+
+    def resolve(self):
+        """ return thread id list of container """
+        try:
+            with open(self.path, 'rb') as tasksf:
+                raw = tasksf.read()
+        except (IOError, OSError):
+            return self.tids
+        with self._lock:
+            if raw != self._raw:
+                self._raw = raw
+                self.tids = raw.decode().split()
+                self.generation += 1
+            return self.tids
@@ -0,0 +1,114 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements hot reload of threshold model file """
+
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import sys
+import traceback
+
+from datetime import datetime
+from threading import Event, Thread
+
+
+def model_version(threshold):
+    """
+    return version of threshold model, digest of its content except the
+    LC utilization maximum agent updates itself
+        threshold - threshold model
+    """
+    model = {key: value for key, value in threshold.items()
+             if key != 'lcutilmax'}
+    content = json.dumps(model, sort_keys=True).encode()
+    return hashlib.sha1(content).hexdigest()[:12]
+
+
+class ThresholdWatcher(object):
+    """
+    This class polls modification of threshold model file in a worker
+    thread, a changed model is parsed and compiled there and swapped into
+    analyzer, monitor loops pick it up by analyzer generation
+    """
+
+    def __init__(self, analyzer, interval, prometheus=None):
+        """
+            analyzer - analyzer holding current threshold model
+            interval - seconds between two polls
+            prometheus - Prometheus client model version is reported to
+        """
+        self.analyzer = analyzer
+        self.interval = interval
+        self.prometheus = prometheus
+        self.stat = self._stat()
+        self.version = model_version(analyzer.threshold)
+        self.shutdown = Event()
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+        self._report()
+
+    def start(self):
+        """ start watcher worker """
+        self.thread.start()
+
+    def stop(self):
+        """ stop watcher worker """
+        self.shutdown.set()
+        self.thread.join()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.analyzer.thresh_file)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size, stat.st_ino
+
+    def _report(self):
+        print(datetime.now().isoformat(' ') + ' threshold model version ' +
+              self.version + ' in use')
+        if self.prometheus:
+            self.prometheus.set_model_version(self.version)
+
+    def reload(self):
+        """ reload threshold model if threshold file changed since last poll
+        """
+        stat = self._stat()
+        if stat is None or stat == self.stat:
+            return
+        try:
+            with open(self.analyzer.thresh_file) as threshf:
+                threshold = json.loads(threshf.read())
+        except ValueError:
+            # file is being written, retry on next poll
+            return
+        version = model_version(threshold)
+        if version != self.version:
+            self.analyzer.set_threshold(threshold)
+            self.version = version
+            self._report()
+        # record file state only once model is in use, failed swap retries
+        self.stat = stat
+
+    def _run(self):
+        while not self.shutdown.wait(self.interval):
+            try:
+                self.reload()
+            except Exception:
+                traceback.print_exc(file=sys.stdout)
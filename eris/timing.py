@@ -0,0 +1,114 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements latency instrumentation of eris monitor loops """
+
+from __future__ import print_function
+from __future__ import division
+
+import time
+
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock
+
+
+class PhaseStat(object):
+    """ This class accumulates durations of one phase between summaries """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+class PhaseTimer(object):
+    """
+    This class records duration of monitor loop phases and late or skipped
+    ticks of timer loops, observations are forwarded to Prometheus client
+    if given and summarized in periodic log
+    """
+
+    def __init__(self, prometheus=None):
+        self.prometheus = prometheus
+        self.stats = dict()
+        self.late_ticks = dict()
+        self.skipped_ticks = dict()
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        measure duration of code block as one phase
+            name - phase name
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, time.time() - start)
+
+    def record(self, name, seconds):
+        """
+        record one phase duration
+            name - phase name
+            seconds - phase duration in seconds
+        """
+        with self._lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = PhaseStat()
+            stat.add(seconds)
+        if self.prometheus:
+            self.prometheus.observe_phase(name, seconds)
+
+    def record_tick(self, loop, skipped):
+        """
+        record one late tick of timer loop
+            loop - timer loop name
+            skipped - number of intervals skipped due to the late tick
+        """
+        with self._lock:
+            self.late_ticks[loop] = self.late_ticks.get(loop, 0) + 1
+            self.skipped_ticks[loop] = self.skipped_ticks.get(loop, 0) +\
+                skipped
+        if self.prometheus:
+            self.prometheus.inc_late_ticks(loop, skipped)
+
+    def summary(self):
+        """ return summary since last call and reset phase statistics """
+        with self._lock:
+            stats = self.stats
+            self.stats = dict()
+            late_ticks = dict(self.late_ticks)
+            skipped_ticks = dict(self.skipped_ticks)
+        lines = [datetime.now().isoformat(' ') + ' eris phase timing:']
+        for name in sorted(stats):
+            stat = stats[name]
+            lines.append('  %s: count=%d avg=%.3fms max=%.3fms' %
+                         (name, stat.count, stat.total / stat.count * 1000,
+                          stat.max * 1000))
+        for loop in sorted(late_ticks):
+            lines.append('  %s: late ticks=%d skipped ticks=%d' %
+                         (loop, late_ticks[loop], skipped_ticks[loop]))
+        return '\n'.join(lines)
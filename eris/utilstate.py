@@ -0,0 +1,104 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+""" This module implements persistence of maximal LC utilization """
+
+from __future__ import print_function
+
+import json
+import os
+import sys
+import traceback
+
+from threading import Event, Lock, Thread
+
+
+class LcUtilMaxState(object):
+    """
+    This class keeps maximal utilization of all LC containers in a small
+    state file separate from threshold model, updates only mark the value
+    dirty and a background writer replaces the file atomically at most once
+    per flush period
+    """
+    STATE_FILE = 'lcutilmax.json'
+
+    def __init__(self, path=STATE_FILE, period=30):
+        """
+            path - state file path
+            period - minimal seconds between two writes
+        """
+        self.path = path
+        self.period = period
+        self.value = self._load()
+        self.written = self.value
+        self.dirty = Event()
+        self.shutdown = Event()
+        self._lock = Lock()
+        self.thread = Thread(target=self._run)
+        self.thread.daemon = True
+
+    def _load(self):
+        try:
+            with open(self.path) as statef:
+                return json.loads(statef.read()).get('lcutilmax', 0)
+        except (IOError, OSError, ValueError):
+            return 0
+
+    def start(self):
+        """ start state writer """
+        self.thread.start()
+
+    def stop(self):
+        """ stop state writer, pending value is written before return """
+        self.shutdown.set()
+        self.dirty.set()
+        self.thread.join()
+        self.flush()
+
+    def update(self, value):
+        """
+        record new maximal LC utilization, written to file later
+            value - maximal LC utilization
+        """
+        self.value = value
+        self.dirty.set()
+
+    def flush(self):
+        """ write current value to state file if it changed """
+        with self._lock:
+            value = self.value
+            if value == self.written:
+                return
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as statef:
+                statef.write(json.dumps({'lcutilmax': value}))
+                statef.flush()
+                os.fsync(statef.fileno())
+            os.rename(tmp, self.path)
+            self.written = value
+
+    def _run(self):
+        while not self.shutdown.is_set():
+            self.dirty.wait()
+            if self.shutdown.is_set():
+                break
+            self.dirty.clear()
+            try:
+                self.flush()
+            except (IOError, OSError):
+                traceback.print_exc(file=sys.stdout)
+            self.shutdown.wait(self.period)
@@ -23,4 +23,8 @@ void set_attr_disabled(struct perf_event_attr *attr, int disabled) {
 
 struct cgroup* get_cgroup(struct cgroup *cgroups, int index) {
     return cgroups + index;
+}
+
+int get_cgroup_cpu(struct cgroup *cgroup, int index) {
+    return cgroup->cpus[index];
 }
\ No newline at end of file
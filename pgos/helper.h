@@ -26,12 +26,22 @@ struct cgroup {
     char* cid;
     uint64_t instructions, cycles, llc_misses, stalls_l2_misses, stalls_memory_load, llc_occupancy;
     double mbm_local, mbm_remote;
+    uint64_t interval;
+    int cpu_count;  /* 0 if the cgroup may run on all cores */
+    int *cpus;
+    double coverage;  /* running/enabled time ratio of perf counters */
+    /*
+     * p50, p95 and maximum of CPI and MPKI, p50, p5 and minimum of memory
+     * bandwidth, of sub-intervals sampled since previous collect
+     */
+    double cpi_p50, cpi_p95, cpi_max;
+    double mpki_p50, mpki_p95, mpki_max;
+    double mb_p50, mb_p5, mb_min;
 };
 
 struct context {
     int ret;
     int core;
-    int period;
     int cgroup_count;
 
     uint64_t timestamp;
@@ -40,5 +50,7 @@ struct context {
 
 struct cgroup* get_cgroup(struct cgroup *cgroups, int index);
 
+int get_cgroup_cpu(struct cgroup *cgroup, int index);
+
 void set_attr_disabled(struct perf_event_attr *attr, int disabled);
 #endif
\ No newline at end of file
@@ -73,19 +73,29 @@ var counters = []PerfCounter{
 }
 
 type Cgroup struct {
-	Index       int
-	Path        string
-	Name        string
-	Pid         uint32
-	File        *os.File `json:"-"`
-	Leaders     []uintptr
-	Followers   []uintptr
-	PgosHandler C.int
+	Path                string
+	Name                string
+	Pid                 uint32
+	File                *os.File `json:"-"`
+	Cpus                []int
+	Leaders             []uintptr
+	Followers           []uintptr
+	Last                []PerfStruct
+	LastRead            time.Time
+	Sub                 SubSamples
+	PgosHandler         C.int
+	Pids                []C.pid_t
+	LlcOccupancy        uint64
+	MbmLocal, MbmRemote uint64
 }
 
 var pqosEnabled bool = false
 var pqosLog *os.File
 
+// session keeps every monitored cgroup, keyed by perf_event cgroup path, so
+// that counters and pqos monitoring groups survive across collect calls.
+var session = make(map[string]*Cgroup)
+
 //export pgos_init
 func pgos_init() C.int {
 	pqosLog, err := os.OpenFile("/tmp/pqos.log", os.O_CREATE|os.O_WRONLY|os.O_TRUNC, os.ModePerm)
@@ -109,79 +119,109 @@ func pgos_init() C.int {
 
 //export pgos_finalize
 func pgos_finalize() {
+	pgos_close_session()
 	if pqosEnabled {
 		pqosLog.Close()
 		C.pqos_fini()
 	}
 }
 
+//export pgos_close_session
+func pgos_close_session() {
+	for path, c := range session {
+		c.Close()
+		delete(session, path)
+	}
+}
+
+// collect reads every cgroup of the session and returns the counter deltas
+// accumulated since the previous call. Cgroups seen for the first time, or
+// whose cpus changed, are opened and started, and report a zero interval;
+// cgroups absent from ctx are closed and dropped from the session. Results
+// are written in place to the cgroup array of ctx, which the caller may
+// reuse across calls.
+//
 //export collect
-func collect(ctx C.struct_context) C.struct_context {
+func collect(ctx *C.struct_context) C.int {
 	ctx.ret = 0
 	coreCount = int(ctx.core)
+	now := time.Now()
+	ctx.timestamp = C.uint64_t(now.UnixNano())
 
-	cgroups := make([]*Cgroup, 0, int(ctx.cgroup_count))
-
+	active := make(map[string]bool, int(ctx.cgroup_count))
 	for i := 0; i < int(ctx.cgroup_count); i++ {
 		cg := C.get_cgroup(ctx.cgroups, C.int(i))
 		cg.ret = 0
+		cg.interval = 0
+		// the cgroup array is reused across calls, values a read does not
+		// set, like pqos ones of a cgroup without monitoring group, are zero
+		cg.llc_occupancy = 0
+		cg.mbm_local = 0
+		cg.mbm_remote = 0
 		path, cid := C.GoString(cg.path), C.GoString(cg.cid)
-		c, code := NewCgroup(path, cid, i)
-		cg.ret |= code
-		if c != nil && pqosEnabled {
-			cg.ret |= c.GetPgosHandler()
-		}
-		if cg.ret == 0 {
-			cgroups = append(cgroups, c)
+		cpus := cgroupCpus(cg)
+		active[path] = true
+		if c, ok := session[path]; ok {
+			if sameCpus(cpus, c.Cpus) {
+				cg.ret = c.Read(cg, now)
+				continue
+			}
+			c.Close()
+			delete(session, path)
 		}
-	}
-	now := time.Now().Unix()
-	ctx.timestamp = C.uint64_t(now)
-	for j := 0; j < len(cgroups); j++ {
-		for k := 0; k < len(cgroups[j].Leaders); k++ {
-			cg := C.get_cgroup(ctx.cgroups, C.int(cgroups[j].Index))
-			code := StartLeader(cgroups[j].Leaders[k])
-			cg.ret |= code
+		c, code := NewCgroup(path, cid, cpus)
+		if code == 0 {
+			code = c.Start(now)
 		}
-	}
-	time.Sleep(time.Duration(ctx.period) * time.Millisecond)
-	for j := 0; j < len(cgroups); j++ {
-		cg := C.get_cgroup(ctx.cgroups, C.int(cgroups[j].Index))
-		res := make([]uint64, len(counters))
-		for k := 0; k < coreCount; k++ {
-			code := StopLeader(cgroups[j].Leaders[k])
-			cg.ret |= code
-			result, code := ReadLeader(cgroups[j].Leaders[k])
-			cg.ret |= code
-			for l := 0; l < len(counters); l++ {
-				res[l] += result.Data[l].Value
+		if code != 0 {
+			if c != nil {
+				c.Close()
 			}
-		}
-		if cg.ret != 0 {
+			cg.ret = code
 			continue
 		}
+		session[path] = c
+	}
+	for path, c := range session {
+		if !active[path] {
+			c.Close()
+			delete(session, path)
+		}
+	}
+	return ctx.ret
+}
 
-		cg.instructions = C.uint64_t(res[0])
-		cg.cycles = C.uint64_t(res[1])
-		cg.llc_misses = C.uint64_t(res[2])
-		cg.stalls_l2_misses = C.uint64_t(res[3])
-		cg.stalls_memory_load = C.uint64_t(res[4])
-
-		if pqosEnabled {
-			pgosValue := C.pgos_mon_poll(cgroups[j].PgosHandler)
-			cg.llc_occupancy = pgosValue.llc / 1024
-			cg.mbm_local = C.double(float64(pgosValue.mbm_local_delta) / 1024.0 / 1024.0 / (float64(ctx.period) / 1000.0))
-			cg.mbm_remote = C.double(float64(pgosValue.mbm_remote_delta) / 1024.0 / 1024.0 / (float64(ctx.period) / 1000.0))
+// cgroupCpus returns the cores counters of cg are opened on, which are all
+// cores unless cg lists the cpus the cgroup is restricted to.
+func cgroupCpus(cg *C.struct_cgroup) []int {
+	n := int(cg.cpu_count)
+	if n == 0 {
+		cpus := make([]int, coreCount)
+		for i := range cpus {
+			cpus[i] = i
 		}
-		cgroups[j].Close()
+		return cpus
 	}
-	if pqosEnabled {
-		C.pgos_mon_stop()
+	cpus := make([]int, n)
+	for i := range cpus {
+		cpus[i] = int(C.get_cgroup_cpu(cg, C.int(i)))
+	}
+	return cpus
+}
+
+func sameCpus(a, b []int) bool {
+	if len(a) != len(b) {
+		return false
 	}
-	return ctx
+	for i := range a {
+		if a[i] != b[i] {
+			return false
+		}
+	}
+	return true
 }
 
-func NewCgroup(path string, cid string, index int) (*Cgroup, C.int) {
+func NewCgroup(path string, cid string, cpus []int) (*Cgroup, C.int) {
 	cgroupFile, err := os.Open(path)
 	if err != nil {
 		return nil, ErrorCannotOpenCgroup
@@ -193,39 +233,130 @@ func NewCgroup(path string, cid string, index int) (*Cgroup, C.int) {
 	} else {
 		cgroupName = cid
 	}
-	leaders := make([]uintptr, 0, coreCount)
-	followers := make([]uintptr, 0, coreCount*(len(counters)-1))
+	c := &Cgroup{
+		Path:        path,
+		Name:        cgroupName,
+		File:        cgroupFile,
+		Cpus:        cpus,
+		Leaders:     make([]uintptr, 0, len(cpus)),
+		Followers:   make([]uintptr, 0, len(cpus)*(len(counters)-1)),
+		PgosHandler: -1,
+	}
 
-	for i := 0; i < coreCount; i++ {
+	for _, i := range cpus {
 		l, code := OpenLeader(cgroupFile.Fd(), uintptr(i), counters[0].Type, counters[0].Config)
 		if code != 0 {
+			c.Close()
 			return nil, code
 		}
-		leaders = append(leaders, l)
+		c.Leaders = append(c.Leaders, l)
 		for j := 1; j < len(counters); j++ {
 			f, code := OpenFollower(l, uintptr(i), counters[j].Type, counters[j].Config)
 			if code != 0 {
+				c.Close()
 				return nil, code
 			}
-			followers = append(followers, f)
+			c.Followers = append(c.Followers, f)
 		}
 	}
-	return &Cgroup{
-		Index:     index,
-		Path:      path,
-		Name:      cgroupName,
-		File:      cgroupFile,
-		Leaders:   leaders,
-		Followers: followers,
-	}, 0
+	return c, 0
 }
 
-func (this *Cgroup) GetPgosHandler() (code C.int) {
-	f, err := os.OpenFile(this.Path+"/tasks", os.O_RDONLY, os.ModePerm)
-	if err != nil {
-		code = ErrorCannotOpenTasks
+// Start enables the counters of the cgroup, which then keep counting until
+// the cgroup is closed, and records the baseline for the first delta.
+func (this *Cgroup) Start(now time.Time) (code C.int) {
+	this.Last = make([]PerfStruct, len(this.Leaders))
+	for k := 0; k < len(this.Leaders); k++ {
+		code |= StartLeader(this.Leaders[k])
+		result, rcode := ReadLeader(this.Leaders[k])
+		code |= rcode
+		this.Last[k] = result
+	}
+	this.LastRead = now
+	this.Sub.reset(this.Last, now)
+	if code == 0 && pqosEnabled {
+		code |= this.GetPgosHandler()
+	}
+	return
+}
+
+// pollMbm polls the pqos monitoring group of the cgroup, adds its memory
+// bandwidth to the totals of the collect interval and returns the bytes
+// transferred since the previous poll.
+func (this *Cgroup) pollMbm() uint64 {
+	pgosValue := C.pgos_mon_poll(this.PgosHandler)
+	this.LlcOccupancy = uint64(pgosValue.llc)
+	this.MbmLocal += uint64(pgosValue.mbm_local_delta)
+	this.MbmRemote += uint64(pgosValue.mbm_remote_delta)
+	return uint64(pgosValue.mbm_local_delta + pgosValue.mbm_remote_delta)
+}
+
+// Read fills cg with the counter deltas since the previous read of the cgroup,
+// and with percentiles of the sub-samples taken meanwhile, the time since the
+// last sub-sample counting as one more sub-sample.
+func (this *Cgroup) Read(cg *C.struct_cgroup, now time.Time) (code C.int) {
+	res := make([]uint64, len(counters))
+	tail := make([]uint64, len(counters))
+	var enabled, running uint64
+	for k := 0; k < len(this.Leaders); k++ {
+		result, rcode := ReadLeader(this.Leaders[k])
+		code |= rcode
+		if rcode != 0 {
+			continue
+		}
+		enabled += result.TimeEnabled - this.Last[k].TimeEnabled
+		running += result.TimeRunning - this.Last[k].TimeRunning
+		delta := result.Delta(this.Last[k])
+		subDelta := result.Delta(this.Sub.Last[k])
+		for l := 0; l < len(counters); l++ {
+			res[l] += delta[l]
+			tail[l] += subDelta[l]
+		}
+		this.Last[k] = result
+	}
+	interval := now.Sub(this.LastRead)
+	this.LastRead = now
+	defer this.Sub.reset(this.Last, now)
+	if code != 0 {
 		return
 	}
+
+	cg.instructions = C.uint64_t(res[0])
+	cg.cycles = C.uint64_t(res[1])
+	cg.llc_misses = C.uint64_t(res[2])
+	cg.stalls_l2_misses = C.uint64_t(res[3])
+	cg.stalls_memory_load = C.uint64_t(res[4])
+	cg.interval = C.uint64_t(interval.Nanoseconds())
+	// counters are scaled by enabled/running time, report how much of the
+	// interval was really counted when the PMU is multiplexed
+	cg.coverage = 1
+	if enabled > 0 {
+		cg.coverage = C.double(float64(running) / float64(enabled))
+	}
+
+	this.Sub.add(tail)
+	if pqosEnabled {
+		if this.PgosHandler >= 0 {
+			seconds := interval.Seconds()
+			this.Sub.addMb(this.pollMbm(), now.Sub(this.Sub.LastTime).Seconds())
+			cg.llc_occupancy = C.uint64_t(this.LlcOccupancy / 1024)
+			cg.mbm_local = C.double(float64(this.MbmLocal) / 1024.0 / 1024.0 / seconds)
+			cg.mbm_remote = C.double(float64(this.MbmRemote) / 1024.0 / 1024.0 / seconds)
+		}
+		this.MbmLocal, this.MbmRemote = 0, 0
+		code |= this.GetPgosHandler()
+	}
+	this.Sub.fill(cg)
+	return
+}
+
+// readTasks returns the pids in the tasks file of the cgroup, which may be
+// empty while the cgroup has no task.
+func readTasks(path string) ([]C.pid_t, C.int) {
+	f, err := os.OpenFile(path+"/tasks", os.O_RDONLY, os.ModePerm)
+	if err != nil {
+		return nil, ErrorCannotOpenTasks
+	}
 	defer f.Close()
 	pids := []C.pid_t{}
 	for {
@@ -236,11 +367,78 @@ func (this *Cgroup) GetPgosHandler() (code C.int) {
 		}
 		pids = append(pids, C.pid_t(pid))
 	}
-	if len(pids) == 0 {
-		code = ErrorCannotOpenTasks
+	return pids, 0
+}
+
+func samePids(a, b []C.pid_t) bool {
+	if len(a) != len(b) {
+		return false
+	}
+	for i := range a {
+		if a[i] != b[i] {
+			return false
+		}
+	}
+	return true
+}
+
+// diffPids returns the pids of b missing in a, and the pids of a missing in b.
+func diffPids(a, b []C.pid_t) (added, removed []C.pid_t) {
+	known := make(map[C.pid_t]bool, len(a))
+	for _, pid := range a {
+		known[pid] = true
+	}
+	for _, pid := range b {
+		if known[pid] {
+			delete(known, pid)
+		} else {
+			added = append(added, pid)
+		}
+	}
+	for _, pid := range a {
+		if known[pid] {
+			removed = append(removed, pid)
+		}
+	}
+	return
+}
+
+// updatePgosPids moves the pqos monitoring group of the cgroup to pids by
+// adding new tasks and removing exited ones, and returns false if pqos
+// rejects either change.
+func (this *Cgroup) updatePgosPids(pids []C.pid_t) bool {
+	added, removed := diffPids(this.Pids, pids)
+	if len(added) > 0 && C.pgos_mon_add_pids(this.PgosHandler, C.unsigned(len(added)), &added[0]) != 0 {
+		return false
+	}
+	if len(removed) > 0 && C.pgos_mon_remove_pids(this.PgosHandler, C.unsigned(len(removed)), &removed[0]) != 0 {
+		return false
+	}
+	return true
+}
+
+// GetPgosHandler starts the pqos monitoring group of the cgroup once, and
+// keeps its task membership up to date with add and remove deltas. The group
+// is restarted only if pqos rejects a delta, and every started group is
+// polled once so that its first memory bandwidth delta starts from there.
+// A cgroup without task keeps its group as is until tasks show up again.
+func (this *Cgroup) GetPgosHandler() (code C.int) {
+	pids, code := readTasks(this.Path)
+	if code != 0 || len(pids) == 0 {
 		return
 	}
+	if this.PgosHandler >= 0 {
+		if samePids(pids, this.Pids) || this.updatePgosPids(pids) {
+			this.Pids = pids
+			return
+		}
+		C.pgos_mon_stop_group(this.PgosHandler)
+	}
 	this.PgosHandler = C.pgos_mon_start_pids(C.unsigned(len(pids)), (*C.pid_t)(unsafe.Pointer(&pids[0])))
+	this.Pids = pids
+	if this.PgosHandler >= 0 {
+		C.pgos_mon_poll(this.PgosHandler)
+	}
 
 	return
 }
@@ -252,6 +450,10 @@ func (this *Cgroup) Close() {
 	for i := 0; i < len(this.Leaders); i++ {
 		syscall.Close(int(this.Leaders[i]))
 	}
+	if pqosEnabled {
+		C.pgos_mon_stop_group(this.PgosHandler)
+	}
+	this.PgosHandler = -1
 	this.File.Close()
 	return
 }
@@ -102,6 +102,7 @@ func StopLeader(leader uintptr) C.int {
 	return ioctl(leader, C.PERF_EVENT_IOC_DISABLE, 0)
 }
 
+// ReadLeader reads the raw, unscaled values of a counter group.
 func ReadLeader(leader uintptr) (PerfStruct, C.int) {
 	b := make([]byte, 1000)
 	_, err := syscall.Read(int(leader), b)
@@ -110,12 +111,20 @@ func ReadLeader(leader uintptr) (PerfStruct, C.int) {
 	}
 	var result PerfStruct
 	binary.Read(bytes.NewBuffer(b), binary.LittleEndian, &result)
-	for i := 0; i < len(result.Data); i++ {
-		if result.TimeRunning == 0 {
-			result.Data[i].Value = 0
-		} else {
-			result.Data[i].Value = uint64(float64(result.Data[i].Value) / float64(result.TimeRunning) * float64(result.TimeEnabled))
-		}
-	}
 	return result, 0
 }
+
+// Delta returns the counter increments since a previous read of the same
+// group, scaled by the enabled/running ratio of that interval.
+func (this PerfStruct) Delta(last PerfStruct) []uint64 {
+	res := make([]uint64, len(this.Data))
+	running := this.TimeRunning - last.TimeRunning
+	enabled := this.TimeEnabled - last.TimeEnabled
+	if running == 0 {
+		return res
+	}
+	for i := 0; i < len(this.Data); i++ {
+		res[i] = uint64(float64(this.Data[i].Value-last.Data[i].Value) / float64(running) * float64(enabled))
+	}
+	return res
+}
@@ -17,35 +17,101 @@
 // 
 #include "pgos.h"
 #include <stdio.h>
+#include <stdlib.h>
 #include <string.h>
 
-#define MAX_PID_GROUP 100
+#define GROUP_TABLE_INIT 64
+
+/*
+ * Monitoring groups are allocated one by one, as libpqos may keep pointers
+ * to them, and tracked in a table which grows on demand. A group handle is
+ * its index in the table, and a slot is reused once its group is stopped.
+ */
+static struct pqos_mon_data **groups;
+static int group_cap;
+
+static struct pqos_mon_data *get_group(int index) {
+    if (index < 0 || index >= group_cap) {
+        return NULL;
+    }
+    return groups[index];
+}
+
+static int grow_groups(void) {
+    int cap = group_cap ? group_cap * 2 : GROUP_TABLE_INIT;
+    struct pqos_mon_data **table = realloc(groups, cap * sizeof(*table));
+    if (table == NULL) {
+        return -1;
+    }
+    memset(table + group_cap, 0, (cap - group_cap) * sizeof(*table));
+    groups = table;
+    group_cap = cap;
+    return 0;
+}
 
-struct pqos_mon_data data[MAX_PID_GROUP];
-int idx = 0;
 int pgos_mon_start_pids(unsigned pid_num, pid_t *pids) {
-    if (idx >= MAX_PID_GROUP) {
+    int i;
+    for (i = 0; i < group_cap; i++) {
+        if (groups[i] == NULL) {
+            break;
+        }
+    }
+    if (i == group_cap && grow_groups() != 0) {
+        return -1;
+    }
+    struct pqos_mon_data *group = calloc(1, sizeof(*group));
+    if (group == NULL) {
+        return -1;
+    }
+    int ret = pqos_mon_start_pids(pid_num, pids, PQOS_MON_EVENT_L3_OCCUP | PQOS_MON_EVENT_LMEM_BW | PQOS_MON_EVENT_RMEM_BW, NULL, group);
+    if (ret != PQOS_RETVAL_OK) {
+        free(group);
         return -1;
     }
-	int ret = pqos_mon_start_pids(pid_num, pids, PQOS_MON_EVENT_L3_OCCUP | PQOS_MON_EVENT_LMEM_BW |PQOS_MON_EVENT_RMEM_BW  , NULL, &data[idx]);
-    return idx ++;
+    groups[i] = group;
+    return i;
+}
+
+int pgos_mon_add_pids(int index, unsigned pid_num, pid_t *pids) {
+    struct pqos_mon_data *group = get_group(index);
+    if (group == NULL || pqos_mon_add_pids(pid_num, pids, group) != PQOS_RETVAL_OK) {
+        return -1;
+    }
+    return 0;
+}
+
+int pgos_mon_remove_pids(int index, unsigned pid_num, pid_t *pids) {
+    struct pqos_mon_data *group = get_group(index);
+    if (group == NULL || pqos_mon_remove_pids(pid_num, pids, group) != PQOS_RETVAL_OK) {
+        return -1;
+    }
+    return 0;
 }
 
 struct pqos_event_values pgos_mon_poll(int index) {
-    if (index < 0 || index > idx) {
+    struct pqos_mon_data *group = get_group(index);
+    if (group == NULL) {
         struct pqos_event_values zero_ret;
         memset(&zero_ret, 0, sizeof(struct pqos_event_values));
         return zero_ret;
     }
-    struct pqos_mon_data *data_addr = &data[index];
-    int ret = pqos_mon_poll(&data_addr, 1);
-    return data[index].values;
+    pqos_mon_poll(&group, 1);
+    return group->values;
+}
+
+void pgos_mon_stop_group(int index) {
+    struct pqos_mon_data *group = get_group(index);
+    if (group == NULL) {
+        return;
+    }
+    pqos_mon_stop(group);
+    free(group);
+    groups[index] = NULL;
 }
 
 void pgos_mon_stop() {
     int i;
-    for (i = 0;i < idx;i ++) {
-        pqos_mon_stop(&data[i]);
+    for (i = 0; i < group_cap; i++) {
+        pgos_mon_stop_group(i);
     }
-    idx = 0;
-}
\ No newline at end of file
+}
@@ -17,6 +17,7 @@
 #
 # SPDX-License-Identifier: Apache-2.0
 #
+import time
 from ctypes import *
 
 class cgroup(Structure):
@@ -30,19 +31,31 @@ class cgroup(Structure):
                 ("stalls_memory_load", c_ulonglong),
                 ("llc_occupancy", c_ulonglong),
                 ("mbm_local", c_double),
-                ("mbm_remote", c_double)]
+                ("mbm_remote", c_double),
+                ("interval", c_ulonglong),
+                ("cpu_count", c_int),
+                ("cpus", POINTER(c_int)),
+                ("coverage", c_double),
+                ("cpi_p50", c_double),
+                ("cpi_p95", c_double),
+                ("cpi_max", c_double),
+                ("mpki_p50", c_double),
+                ("mpki_p95", c_double),
+                ("mpki_max", c_double),
+                ("mb_p50", c_double),
+                ("mb_p5", c_double),
+                ("mb_min", c_double)]
 
 class context(Structure):
     _fields_ = [("ret", c_int),
                 ("core", c_int),
-                ("period", c_int),
                 ("cgroup_count", c_int),
                 ("timestamp", c_ulonglong),
                 ("cgroups", POINTER(cgroup))]
 
 lib = cdll.LoadLibrary('./libpgos.so')
-lib.collect.argtypes = [context]
-lib.collect.restype = context
+lib.collect.argtypes = [POINTER(context)]
+lib.collect.restype = c_int
 
 
 cg0 = cgroup()
@@ -54,20 +67,21 @@ cg1.path = '/sys/fs/cgroup/perf_event/docker/ced2f4992c4ca36ace9161cd06170712584
 cg1.cid = 'memcache'.encode()
 ctx = context()
 ctx.core = 22
-ctx.period = 20000
 ctx.cgroup_count = 2
 ctx.cgroups = (cgroup * 2)(cg0, cg1)
 
 ret = lib.pgos_init()
 print(ret)
+lib.collect(byref(ctx))
 
 for i in range(5):
-      ret = lib.collect(ctx)
-      cg = ret.cgroups[0]
+      time.sleep(20)
+      lib.collect(byref(ctx))
+      cg = ctx.cgroups[0]
       print(cg.ret, cg.instructions, cg.cycles, cg.llc_misses, cg.stall_l2_misses,
-            cg.stalls_memory_load, cg.llc_occupancy, cg.mbm_local, cg.mbm_remote)
-      cg = ret.cgroups[1]
+            cg.stalls_memory_load, cg.llc_occupancy, cg.mbm_local, cg.mbm_remote, cg.interval)
+      cg = ctx.cgroups[1]
       print(cg.ret, cg.instructions, cg.cycles, cg.llc_misses, cg.stall_l2_misses,
-            cg.stalls_memory_load, cg.llc_occupancy, cg.mbm_local, cg.mbm_remote)
+            cg.stalls_memory_load, cg.llc_occupancy, cg.mbm_local, cg.mbm_remote, cg.interval)
 
 lib.pgos_finalize()
\ No newline at end of file
@@ -0,0 +1,129 @@
+// Copyright (C) 2018 Intel Corporation
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+// http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing,
+// software distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions
+// and limitations under the License.
+//
+//
+// SPDX-License-Identifier: Apache-2.0
+
+package main
+
+// #include <stdint.h>
+// #include <sys/types.h>
+// #include "pgos.h"
+// #include "helper.h"
+import "C"
+import (
+	"math"
+	"sort"
+	"time"
+)
+
+// SubSamples keeps the CPI, MPKI and memory bandwidth of every sub-interval
+// of a cgroup read since its previous collect, so that collect reports their
+// distribution and not only the average of the whole interval.
+type SubSamples struct {
+	Last     []PerfStruct
+	LastTime time.Time
+	Cpi      []float64
+	Mpki     []float64
+	Mb       []float64
+}
+
+// reset starts the sub-samples of a new collect interval from last.
+func (this *SubSamples) reset(last []PerfStruct, now time.Time) {
+	this.Last = append(this.Last[:0], last...)
+	this.LastTime = now
+	this.Cpi = this.Cpi[:0]
+	this.Mpki = this.Mpki[:0]
+	this.Mb = this.Mb[:0]
+}
+
+// add appends the counter increments of one sub-interval, sub-intervals
+// without retired instructions carry no CPI or MPKI.
+func (this *SubSamples) add(res []uint64) {
+	if res[0] == 0 {
+		return
+	}
+	this.Cpi = append(this.Cpi, float64(res[1])/float64(res[0]))
+	this.Mpki = append(this.Mpki, float64(res[2])*1000/float64(res[0]))
+}
+
+// addMb appends the memory bandwidth in MB/s of one sub-interval.
+func (this *SubSamples) addMb(bytes uint64, seconds float64) {
+	if seconds > 0 {
+		this.Mb = append(this.Mb, float64(bytes)/1024.0/1024.0/seconds)
+	}
+}
+
+// fill writes p50, p95 and maximum of CPI and MPKI sub-samples to cg, and
+// p50, p5 and minimum of memory bandwidth sub-samples, as contention shows
+// as high CPI and MPKI but as low memory bandwidth.
+func (this *SubSamples) fill(cg *C.struct_cgroup) {
+	cg.cpi_p50, cg.cpi_p95, cg.cpi_max = percentiles(this.Cpi, 0.5, 0.95, 1)
+	cg.mpki_p50, cg.mpki_p95, cg.mpki_max = percentiles(this.Mpki, 0.5, 0.95, 1)
+	cg.mb_p50, cg.mb_p5, cg.mb_min = percentiles(this.Mb, 0.5, 0.05, 0)
+}
+
+// percentiles returns nearest-rank percentiles p1, p2 and p3 of values, given
+// as ratios, which are all zero if there is no value.
+func percentiles(values []float64, p1, p2, p3 float64) (v1, v2, v3 C.double) {
+	if len(values) == 0 {
+		return
+	}
+	sorted := append([]float64(nil), values...)
+	sort.Float64s(sorted)
+	rank := func(p float64) C.double {
+		index := int(math.Ceil(p*float64(len(sorted)))) - 1
+		if index < 0 {
+			index = 0
+		}
+		return C.double(sorted[index])
+	}
+	return rank(p1), rank(p2), rank(p3)
+}
+
+// Sample reads the running counters and pqos monitoring group of the cgroup
+// without stopping them, and keeps one sub-sample covering the time since the
+// previous sample or collect.
+func (this *Cgroup) Sample(now time.Time) {
+	results := make([]PerfStruct, len(this.Leaders))
+	res := make([]uint64, len(counters))
+	for k := 0; k < len(this.Leaders); k++ {
+		result, code := ReadLeader(this.Leaders[k])
+		if code != 0 {
+			return
+		}
+		results[k] = result
+		delta := result.Delta(this.Sub.Last[k])
+		for l := 0; l < len(counters); l++ {
+			res[l] += delta[l]
+		}
+	}
+	copy(this.Sub.Last, results)
+	this.Sub.add(res)
+	if pqosEnabled && this.PgosHandler >= 0 {
+		this.Sub.addMb(this.pollMbm(), now.Sub(this.Sub.LastTime).Seconds())
+	}
+	this.Sub.LastTime = now
+}
+
+// pgos_sample takes one sub-sample of every cgroup of the session, the
+// sub-samples are summarized as percentiles by the next collect.
+//
+//export pgos_sample
+func pgos_sample() {
+	now := time.Now()
+	for _, c := range session {
+		c.Sample(now)
+	}
+}
@@ -19,59 +19,24 @@
 
 from __future__ import print_function
 import logging
-from enum import Enum
 import json
-from scipy import stats
 import numpy as np
-import pandas as pd
 
-from .gmmfense import GmmFense
+from .columnar import read_frame
+from .metric import Metric
+from .threshold import ThresholdModel
 log = logging.getLogger(__name__)
 
 
-class Metric(str, Enum):
-    """ This enumeration defines calculated metrics from owca measurements """
-    CYC = 'cycle'
-    INST = 'instruction'
-    L3MISS = 'cache_miss'
-    L3OCC = 'cache_occupancy'
-    MB = 'memory_bandwidth_total'
-    MBL = 'memory_bandwidth_local'
-    MBR = 'memory_bandwidth_remote'
-    CPI = 'cycles_per_instruction'
-    L3MPKI = 'cache_miss_per_kilo_instruction'
-    NF = 'normalized_frequency'
-    UTIL = 'cpu_utilization'
-    L2STALL = 'stalls_l2_miss'
-    MEMSTALL = 'stalls_mem_load'
-    L2SPKI = 'stalls_l2miss_per_kilo_instruction'
-    MSPKI = 'stalls_memory_load_per_kilo_instruction'
-    LCCAPACITY = 'latency_critical_utilization_capacity'
-    LCMAX = 'latency_critical_utilization_max'
-    SYSUTIL = 'system_utilization'
-
-
-class Analyzer:
-    UTIL_FILE = 'util.csv'
-    METRIC_FILE = 'metric.csv'
-    THRESH_FILE = 'threshold.json'
+class Analyzer(ThresholdModel):
+    """
+    This class builds threshold model from recorded data, scipy and
+    scikit-learn are imported only when a model is built
+    """
     UTIL_BIN_STEP = 50
-
-    def __init__(self, wl_file=None, thresh_file=THRESH_FILE):
-        if wl_file:
-            try:
-                with wl_file as wlf:
-                    self.workload_meta = json.loads(wlf.read())
-            except Exception as e:
-                log.exception('cannot read workload file - stopped')
-                raise e
-
-        self.thresh_file = thresh_file
-        try:
-            with open(thresh_file, 'r') as threshf:
-                self.threshold = json.loads(threshf.read())
-        except Exception:
-            self.threshold = {}
+    MODEL_COLUMNS = ['name', Metric.UTIL, Metric.NF, Metric.CPI, Metric.L3MPKI,
+                     Metric.MB, Metric.MBL, Metric.MBR, Metric.L2SPKI,
+                     Metric.MSPKI]
 
     def partition_utilization(self, cpu_number, step=UTIL_BIN_STEP):
         """
@@ -97,6 +62,8 @@ class Analyzer:
         freq = tdp_data[Metric.NF]
 
         if not util.empty:
+            from scipy import stats
+
             mean, std = stats.norm.fit(freq)
 
             min_freq = min(freq)
@@ -110,6 +77,8 @@ class Analyzer:
                 'bar': np.float64(fbar).item()}
 
     def _get_fense_origin(self, mdf, is_upper, strict, span):
+        from .gmmfense import GmmFense
+
         gmm_fense = GmmFense(mdf.values.reshape(-1, 1))
         if strict:
             return gmm_fense.get_strict_fense(is_upper, span)
@@ -120,6 +89,8 @@ class Analyzer:
         if use_origin is True:
             return self._get_fense_origin(mdf, is_upper, strict, span)
 
+        from .gmmfense import GmmFense
+
         gmm_fense = GmmFense(mdf.values.reshape(-1, 1))
 
         return gmm_fense.get_gaussian_round_fense(is_upper, strict, span)
@@ -177,37 +148,21 @@ class Analyzer:
                                   job, util)
 
     def _process_lc_max(self, util_file):
-        udf = pd.read_csv(util_file)
+        udf = read_frame(util_file, ['name', Metric.UTIL])
         lcu = udf[udf['name'] == 'lcs']
         lcu = udf[Metric.UTIL]
         maxulc = int(lcu.max())
         self.threshold['lcutilmax'] = maxulc
         log.debug('max LC utilization: %f', maxulc)
 
-    def get_lcutilmax(self):
-        return self.threshold.get('lcutilmax', 0)
-
-    def get_wl_meta(self):
-        return self.workload_meta
-
-    def update_lcutilmax(self, lc_utils):
-        self.threshold['lcutilmax'] = lc_utils
-        with open(self.thresh_file, 'w') as threshf:
-            threshf.write(json.dumps(self.threshold))
-
-    def get_thresh(self, job):
-        return self.threshold[job]['thresh'] if job in self.threshold else {}
-
-    def get_tdp_thresh(self, job):
-        return self.threshold[job]['tdp'] if job in self.threshold else {}
-
-    def build_model(self, util_file=UTIL_FILE, metric_file=METRIC_FILE,
+    def build_model(self, util_file=ThresholdModel.UTIL_FILE,
+                    metric_file=ThresholdModel.METRIC_FILE,
                     span=4, strict=True, use_origin=False, verbose=False):
         if self.threshold:
             return
 
         self._process_lc_max(util_file)
-        mdf = pd.read_csv(metric_file)
+        mdf = read_frame(metric_file, Analyzer.MODEL_COLUMNS)
         cnames = mdf['name'].unique()
         for cname in cnames:
             self.threshold[cname] = {"tdp": {}, "thresh": []}
@@ -215,6 +170,7 @@ class Analyzer:
             self._build_tdp_thresh(jdata)
             self._build_thresh(jdata, span, strict, use_origin, verbose)
 
+        self.tables = dict()
         if verbose:
             log.warn(self.threshold)
         with open(self.thresh_file, 'w') as threshf:
@@ -0,0 +1,145 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module implements columnar recording format of utilization and metrics
+data. One record is a directory of append-only chunks, each chunk is a
+compressed npz archive holding one typed array per column, string columns
+are dictionary encoded as int32 codes plus a dictionary array
+"""
+
+import os
+
+from os.path import join as path_join
+
+import numpy as np
+
+CHUNK_PREFIX = 'chunk-'
+CHUNK_SUFFIX = '.npz'
+DICT_SUFFIX = '.dict'
+
+
+def _column_name(col):
+    return getattr(col, 'value', col)
+
+
+def _chunk_files(path):
+    return sorted(f for f in os.listdir(path)
+                  if f.startswith(CHUNK_PREFIX) and f.endswith(CHUNK_SUFFIX))
+
+
+class ColumnarWriter(object):
+    """
+    This class buffers rows in memory and appends them to the record as one
+    chunk every flush_cycles cycles
+    """
+
+    def __init__(self, path, schema, flush_cycles=10):
+        """
+            path - record directory
+            schema - list of (column name, numpy dtype), str for strings
+            flush_cycles - cycles buffered before one chunk is written
+        """
+        self.path = path
+        self.columns = [_column_name(col) for col, _ in schema]
+        self.dtypes = [dtype for _, dtype in schema]
+        self.flush_cycles = flush_cycles
+        self.rows = []
+        self.cycles = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.chunk_no = len(_chunk_files(path))
+
+    def append(self, row):
+        """
+        buffer one row
+            row - column values in schema order
+        """
+        self.rows.append(row)
+
+    def end_cycle(self):
+        """ mark end of one cycle, flush buffered rows if it is due """
+        self.cycles += 1
+        if self.cycles >= self.flush_cycles:
+            self.flush()
+
+    def flush(self):
+        """ write buffered rows as one chunk """
+        self.cycles = 0
+        if not self.rows:
+            return
+        arrays = dict()
+        values = list(zip(*self.rows))
+        for col, dtype, vals in zip(self.columns, self.dtypes, values):
+            if dtype is str:
+                uniques, codes = np.unique(np.array(vals, dtype=str),
+                                           return_inverse=True)
+                arrays[col] = codes.astype(np.int32)
+                arrays[col + DICT_SUFFIX] = uniques
+            else:
+                arrays[col] = np.array(vals, dtype=dtype)
+        name = CHUNK_PREFIX + '%08d' % self.chunk_no + CHUNK_SUFFIX
+        tmp = path_join(self.path, '.' + name)
+        with open(tmp, 'wb') as chunkf:
+            np.savez_compressed(chunkf, **arrays)
+        os.rename(tmp, path_join(self.path, name))
+        self.chunk_no += 1
+        self.rows = []
+
+
+def read_columns(path, columns=None):
+    """
+    read columns of all chunks in record
+        path - record directory
+        columns - columns to read, None for all, absent columns are ignored
+    return dict of column name to concatenated array
+    """
+    if columns is not None:
+        columns = {_column_name(col) for col in columns}
+    parts = dict()
+    for chunk in _chunk_files(path):
+        with np.load(path_join(path, chunk), allow_pickle=False) as data:
+            names = [f for f in data.files if not f.endswith(DICT_SUFFIX)]
+            for col in names:
+                if columns is not None and col not in columns:
+                    continue
+                values = data[col]
+                if col + DICT_SUFFIX in data.files:
+                    values = data[col + DICT_SUFFIX][values]
+                parts.setdefault(col, []).append(values)
+    return {col: np.concatenate(vals) for col, vals in parts.items()}
+
+
+def read_frame(source, columns=None):
+    """
+    read recorded data as pandas DataFrame, source is either a columnar
+    record directory or a csv file
+        source - record directory, csv file path or file object
+        columns - columns to read, None for all, absent columns are ignored
+    """
+    import pandas as pd
+
+    if isinstance(source, str) and os.path.isdir(source):
+        data = read_columns(source, columns)
+        order = [_column_name(col) for col in columns
+                 if _column_name(col) in data]\
+            if columns is not None else list(data)
+        return pd.DataFrame({col: data[col] for col in order}, columns=order)
+    if columns is None:
+        return pd.read_csv(source)
+    names = {_column_name(col) for col in columns}
+    return pd.read_csv(source, usecols=lambda col: col in names)
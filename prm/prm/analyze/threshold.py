@@ -0,0 +1,146 @@
+# Copyright (C) 2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions
+# and limitations under the License.
+#
+#
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+This module implements threshold model loading and compiled threshold tables
+of workloads, it is used at agent runtime and depends on standard library
+only
+"""
+
+import json
+import logging
+
+from bisect import bisect_right
+from threading import Lock
+
+log = logging.getLogger(__name__)
+
+
+class ThresholdTable(object):
+    """
+    This class compiles threshold bins of one workload into sorted bin edges
+    and parallel limit lists so the bin of a utilization is found by bisect.
+    It is also a read only sequence of the original bin dicts
+    """
+    LIMITS = ['cpi', 'mpki', 'mb', 'mspki', 'l2spki']
+
+    def __init__(self, bins):
+        """
+            bins - list of threshold bin dicts of one workload
+        """
+        self.bins = sorted(bins, key=lambda thresh: thresh['util_start'])
+        self.starts = [thresh['util_start'] for thresh in self.bins]
+        self.cpi = self._limits('cpi')
+        self.mpki = self._limits('mpki')
+        self.mb = self._limits('mb')
+        self.mspki = self._limits('mspki')
+        self.l2spki = self._limits('l2spki')
+        self.rows = list(zip(self.cpi, self.mpki, self.mb, self.mspki,
+                             self.l2spki))
+
+    def _limits(self, key):
+        return [thresh.get(key, float('nan')) for thresh in self.bins]
+
+    def __len__(self):
+        return len(self.bins)
+
+    def __getitem__(self, index):
+        return self.bins[index]
+
+    def __iter__(self):
+        return iter(self.bins)
+
+    def find(self, utils):
+        """
+        return index of bin utilization falls in, -1 if it is below the
+        lowest bin
+            utils - cpu utilization
+        """
+        return bisect_right(self.starts, utils) - 1
+
+
+class ThresholdModel(object):
+    """
+    This class loads workload meta data and threshold model file, threshold
+    bins are compiled into shared tables on first use
+    """
+    UTIL_FILE = 'util.csv'
+    METRIC_FILE = 'metric.csv'
+    UTIL_RECORD = 'util.chunks'
+    METRIC_RECORD = 'metric.chunks'
+    THRESH_FILE = 'threshold.json'
+
+    def __init__(self, wl_file=None, thresh_file=THRESH_FILE):
+        if wl_file:
+            try:
+                with wl_file as wlf:
+                    self.workload_meta = json.loads(wlf.read())
+            except Exception as e:
+                log.exception('cannot read workload file - stopped')
+                raise e
+
+        self.thresh_file = thresh_file
+        self.tables = dict()
+        self.generation = 0
+        self._lock = Lock()
+        try:
+            with open(thresh_file, 'r') as threshf:
+                self.threshold = json.loads(threshf.read())
+        except Exception:
+            self.threshold = {}
+
+    def get_lcutilmax(self):
+        return self.threshold.get('lcutilmax', 0)
+
+    def get_wl_meta(self):
+        return self.workload_meta
+
+    def update_lcutilmax(self, lc_utils):
+        self.threshold['lcutilmax'] = lc_utils
+        with open(self.thresh_file, 'w') as threshf:
+            threshf.write(json.dumps(self.threshold))
+
+    def get_thresh(self, job):
+        """
+        return compiled threshold table of workload, shared by all callers
+        until the model changes
+            job - workload name
+        """
+        with self._lock:
+            table = self.tables.get(job)
+            if table is None:
+                bins = self.threshold[job]['thresh'] if job in self.threshold\
+                    else []
+                table = self.tables[job] = ThresholdTable(bins)
+            return table
+
+    def set_threshold(self, threshold):
+        """
+        replace threshold model, tables of all workloads in the model are
+        compiled before the swap and generation is increased
+            threshold - threshold model loaded from threshold file
+        """
+        tables = {job: ThresholdTable(model['thresh'])
+                  for job, model in threshold.items()
+                  if isinstance(model, dict) and 'thresh' in model}
+        with self._lock:
+            self.threshold = threshold
+            self.tables = tables
+            self.generation += 1
+
+    def get_tdp_thresh(self, job):
+        return self.threshold[job]['tdp'] if job in self.threshold else {}